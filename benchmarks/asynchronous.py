@@ -0,0 +1,96 @@
+"""Requests to a slow local echo server, made one after another and as asynchronous calls."""
+
+
+
+import os
+import sys
+import time
+import types
+import socket
+import asyncio
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+
+
+
+# Seconds the server waits before echoing each request
+DELAY = 0.1
+
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """Threaded server with room for every connection to wait, so that none is refused and retried."""
+
+    daemon_threads, request_queue_size = True, 128
+
+
+
+class Echo(socketserver.BaseRequestHandler):
+    """Echo one message back after a delay, like a slow service."""
+
+    def handle(self) -> None:
+        message = self.request.recv(1024)
+        time.sleep(DELAY)
+        self.request.sendall(message)
+
+
+
+def request(port: int, message: any) -> str:
+    """Send `message` to the server and return its reply, blocking meanwhile."""
+
+    with socket.create_connection(("127.0.0.1", port)) as connection:
+        connection.sendall(str(message).encode())
+        return connection.recv(1024).decode()
+
+
+async def fetch(port: int, message: any) -> str:
+    """Send `message` to the server and return its reply, as a coroutine."""
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(str(message).encode())
+
+    try: return (await reader.read(1024)).decode()
+    finally: writer.close(); await writer.wait_closed()
+
+
+
+def measure(expr: str) -> float:
+    """Time in seconds to evaluate `expr`."""
+    start = time.perf_counter(); ev.run(prs.parse(expr))
+    return time.perf_counter() - start
+
+
+def main(count: int = 20) -> None:
+    """Make `count` requests sequentially, then concurrently in threads and as coroutines."""
+
+    cf.config.initialize({})
+
+    server = Server(("127.0.0.1", 0), Echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    # Imported calls take their arguments as written, so the client functions are imported from a stand-in module
+    sys.modules["echo"] = types.SimpleNamespace(request=request, fetch=fetch)
+    ev.run(prs.parse("(import echo)"))
+
+    try:
+        sequential = measure(f"(do ({" ".join(f"(echo.request {port} {n})" for n in range(count))}) #t)")
+        threaded = measure(f"(gather {" ".join(f"(async-call echo.request {port} {n})" for n in range(count))})")
+        native = measure(f"(gather {" ".join(f"(async-call echo.fetch {port} {n})" for n in range(count))})")
+
+        print(f"{count} requests, {DELAY:.2f} s each")
+        print(f"sequential  {sequential:7.3f} s")
+        print(f"threads     {threaded:7.3f} s   speedup {sequential/threaded:5.1f}x")
+        print(f"coroutines  {native:7.3f} s   speedup {sequential/native:5.1f}x")
+
+    finally: server.shutdown(); server.server_close()
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,50 @@
+"""Capturing closures which refer to increasing amounts of data, by deep-copying the environment
+as closures used to and by sharing the free variables."""
+
+
+
+import os
+import sys
+import copy
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import datatypes as dt
+import environment as env
+
+
+
+def measure(capture: callable, repeat: int) -> tuple:
+    """Average time in microseconds and memory in bytes of one capture."""
+
+    start = time.perf_counter()
+    for _ in range(repeat): capture()
+    elapsed = (time.perf_counter() - start) / repeat * 10**6
+
+    tracemalloc.start(); closure = capture(); size = tracemalloc.get_traced_memory()[0]; tracemalloc.stop()
+
+    return elapsed, size
+
+
+def main(repeat: int = 100) -> None:
+    """Return a lambda which refers to a list from the call that created it."""
+
+    cf.config.initialize({})
+
+    _, parameters, body = prs.parse("(lambda (x) (+ x (car data)))")
+
+    for size in (10, 1000, 100000):
+
+        closure = env.Environment([{ "data" : dt.List.of(range(size)) }])
+
+        (copied, before), (captured, after) = measure(lambda: copy.deepcopy(closure.env), repeat), measure(lambda: closure.enclose(dt.Function("lambda", parameters, body)), repeat)
+
+        print(f"size {size:<6} copied {copied:10.3f} us {before:9} B   captured {captured:8.3f} us {after:6} B")
+
+
+
+if __name__ == "__main__": main()
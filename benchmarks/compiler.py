@@ -0,0 +1,59 @@
+"""Recursive programs run by the interpreter and by the closure compiler (-c).
+\nCompiled calls run on the Python stack, so recursion deeper than `compiler.LIMIT` carries on in the
+interpreter; the deep case checks that this fallback costs no more than interpreting throughout."""
+
+
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+FIB = """
+(def fib (n) (cond ((< n 2) n) (else (+ (fib (- n 1)) (fib (- n 2))))))
+(fib 20)
+"""
+
+DEEP = """
+(def rec (n) (cond ((== n 0) 0) (else (+ 1 (rec (- n 1))))))
+(rec 2000) (rec 2000) (rec 2000) (rec 2000) (rec 2000)
+"""
+
+
+
+def measure(location: str, flags: list, repeat: int) -> float:
+    """Best time in seconds to run the file at `location` with `flags`."""
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "src/main.py"), location, "-n", *flags], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main(repeat: int = 3) -> None:
+    """Compare both engines on fib, on deep non-tail recursion and on the meta-circular evaluator in examples/lisp.alv."""
+
+    with tempfile.NamedTemporaryFile("w", suffix=".alv", delete=False) as fib, tempfile.NamedTemporaryFile("w", suffix=".alv", delete=False) as deep:
+        fib.write(FIB); deep.write(DEEP)
+
+    try:
+        for name, location in (("fib 20", fib.name), ("rec 2000", deep.name), ("lisp.alv", os.path.join(ROOT, "examples/lisp.alv"))):
+
+            interpreted, compiled = measure(location, [], repeat), measure(location, ["-c"], repeat)
+
+            print(f"{name:<10} interpreted {interpreted:8.3f} s   compiled {compiled:8.3f} s   speedup {interpreted/compiled:5.2f}x")
+
+    finally: os.remove(fib.name); os.remove(deep.name)
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,63 @@
+"""Independent interpreters run concurrently on a pool of threads, each in its own context."""
+
+
+
+import os
+import sys
+import time
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+
+
+
+# Every interpreter defines the same names, so any interference between them changes the result
+PROGRAM = """
+(def spin (n k) (cond ((== k 0) n) (else (spin (+ n 1) (- k 1)))))
+(set start {start})
+(spin start 2000)
+"""
+
+
+
+def program(start: int) -> any:
+    """Run the program in a new interpreter and return its last value."""
+
+    context = cf.InterpreterContext()
+    context.initialize({})
+
+    return context.run(lambda: [ ev.run(form) for form in prs.read(PROGRAM.format(start=start)) ][-1])
+
+
+def measure(threads: int, jobs: int) -> float:
+    """Time in seconds to run `jobs` interpreters on `threads` threads, checking that none interfered."""
+
+    start = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        values = [*pool.map(program, range(jobs))]
+
+    assert values == [ n + 2000 for n in range(jobs) ], "interpreters interfered with each other"
+
+    return time.perf_counter() - start
+
+
+def main(jobs: int = 32) -> None:
+    """Throughput on 1, 2, 4 and 8 threads."""
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {"enabled" if gil else "disabled"}, {os.cpu_count()} cores")
+
+    serial = measure(1, jobs)
+
+    for threads in (1, 2, 4, 8):
+        elapsed = serial if threads == 1 else measure(threads, jobs)
+        print(f"{threads} threads {jobs/elapsed:8.1f} programs/s   speedup {serial/elapsed:5.2f}x")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,64 @@
+"""Time to add and delete an extension as more and more extensions are registered, in memory and saved to the
+extension store with -p."""
+
+
+
+import os
+import sys
+import time
+import tempfile
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src")
+sys.path.insert(0, SOURCE)
+
+import alvin
+import interpreter as intrp
+
+
+
+# An extension defining `f<n>`, added as the keyword `e<n>`
+BLOCK = "@start\n#INCLUDE f{n} as e{n}\ndef f{n}(x): return x + {n}\n@end"
+
+
+def measure(permanent: bool, sizes: list, batch: int = 200) -> list:
+    """Mean milliseconds to add and to delete an extension once `size` are registered, for each size in turn."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(f"{directory}/src")
+        open(f"{directory}/src/extensions.py", "w").close()
+
+        env = alvin.interpreter({ "-p" : permanent })
+
+        # The store of this interpreter is kept in the temporary directory
+        env.PATH = directory
+
+        results, registered = [], 0
+
+        for size in sizes:
+            while registered < size: env.run(intrp.interpreter.extend, BLOCK.format(n=registered)); registered += 1
+
+            start = time.perf_counter()
+            for n in range(size, size + batch): env.run(intrp.interpreter.extend, BLOCK.format(n=n))
+            added = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for n in range(size, size + batch): alvin.eval(f"(delex e{n})", env=env)
+            deleted = time.perf_counter() - start
+
+            results.append((size, added / batch * 1000, deleted / batch * 1000))
+
+    return results
+
+
+def main(sizes: list = [0, 100, 1000, 5000]) -> None:
+    """Print the cost of each operation, which should not grow with the number of extensions."""
+
+    for permanent in (False, True):
+        print("saved with -p" if permanent else "in memory")
+
+        for size, added, deleted in measure(permanent, sizes):
+            print(f"  {size:>5} registered   add {added:7.3f} ms   delete {deleted:7.3f} ms")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,53 @@
+"""A loop full of constant expressions, run with and without constant folding (-O)."""
+
+
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+LOOP = """
+(def step (n) (+ n (- (+ (* 2 (+ 3 4)) (len (cons 1 '(2 3)))) (cadr '(13 14 15)))))
+(set total 0)
+(repeat 20000 (update total (step total)))
+total
+"""
+
+
+
+def measure(location: str, flags: list, repeat: int) -> float:
+    """Best time in seconds to run the file at `location` with `flags`."""
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "src/main.py"), location, "-n", *flags], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main(repeat: int = 3) -> None:
+    """Compare the loop with and without folding, in both engines."""
+
+    with tempfile.NamedTemporaryFile("w", suffix=".alv", delete=False) as file: file.write(LOOP)
+
+    try:
+        for name, flags in (("interpreted", []), ("compiled", ["-c"])):
+
+            plain, folded = measure(file.name, flags, repeat), measure(file.name, [*flags, "-O"], repeat)
+
+            print(f"{name:<12} plain {plain:8.3f} s   folded {folded:8.3f} s   speedup {plain/folded:5.2f}x")
+
+    finally: os.remove(file.name)
+
+
+
+if __name__ == "__main__": main()
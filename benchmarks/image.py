@@ -0,0 +1,58 @@
+"""A short script run after loading its library, and after restoring an image saved once the library was loaded."""
+
+
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src")
+
+
+
+# A library of many small functions, templates and instances, and a table computed when it is loaded
+LIBRARY = "\n".join([
+    *(f"(def f{n} (x) (+ x {n}))" for n in range(500)),
+    *(f"(template t{n} (x y) (var z {n}) (func total () (+ x y z)))\n(set i{n} (new t{n} ({n} {n})))" for n in range(100)),
+    "(def table (n) (cond ((== n 0) '()) (else (cons (f499 n) (table (- n 1))))))",
+    "(set squares (table 300))"
+])
+
+SCRIPT = "(f1 1)\n(i99 total)\n(car squares)\n"
+
+
+def measure(command: list, runs: int) -> float:
+    """Mean time in seconds to run `command`."""
+
+    start = time.perf_counter()
+    for _ in range(runs): subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return (time.perf_counter() - start) / runs
+
+
+def main(runs: int = 10) -> None:
+    """Compare the time per script, with the parse cache of the library already written."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        library, script, save, image = (f"{directory}/{name}" for name in ("library.alv", "script.alv", "save.alv", "library.img"))
+
+        with open(library, "w") as file: file.write(LIBRARY)
+        with open(script, "w") as file: file.write(SCRIPT)
+        with open(save, "w") as file: file.write(f"(save-image {image})\n")
+
+        # Writes the parse cache of the library, then the image
+        subprocess.run([sys.executable, f"{SOURCE}/main.py", library, save], check=True, stdout=subprocess.DEVNULL)
+
+        loaded = measure([sys.executable, f"{SOURCE}/main.py", library, script], runs)
+        restored = measure([sys.executable, f"{SOURCE}/main.py", "--image", image, script], runs)
+
+        size = os.path.getsize(image)
+
+    print(f"load library  {loaded*1000:8.1f} ms")
+    print(f"restore image {restored*1000:8.1f} ms   speedup {loaded/restored:6.1f}x   ({size // 1024} KiB)")
+
+
+
+if __name__ == "__main__": main()
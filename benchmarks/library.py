@@ -0,0 +1,58 @@
+"""Cold import of the library, then evaluation from Python: text parsed on every call, forms parsed
+once, and function calls."""
+
+
+
+import os
+import sys
+import time
+import subprocess
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src")
+sys.path.insert(0, SOURCE)
+
+
+
+# Time to import the library in a fresh process, printed by the process itself
+IMPORT = "import time; start = time.perf_counter(); import alvin; print(time.perf_counter() - start)"
+
+
+def cold_import(runs: int = 5) -> float:
+    """Fastest of `runs` imports of the library, each in a new process."""
+    return min(float(subprocess.run([sys.executable, "-c", IMPORT], cwd=SOURCE, capture_output=True, text=True, check=True).stdout) for _ in range(runs))
+
+
+def rate(function: callable, seconds: float = 1) -> float:
+    """Calls of `function` per second, over about `seconds`."""
+
+    count, start = 0, time.perf_counter()
+
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(100): function()
+        count += 100
+
+    return count / elapsed
+
+
+def main() -> None:
+    """Report the import time, the time to create an interpreter, and the rate of each kind of evaluation."""
+
+    print(f"cold import        {cold_import()*1000:8.1f} ms")
+
+    import alvin
+
+    start = time.perf_counter(); env = alvin.interpreter()
+    print(f"new interpreter    {(time.perf_counter() - start)*1000:8.1f} ms")
+
+    alvin.eval("(def inc (x) (+ x 1))", env=env)
+    form = alvin.parse("(inc 41)")
+
+    for label, function in [
+        ("eval text",   lambda: alvin.eval("(inc 41)", env=env)),
+        ("eval parsed", lambda: alvin.eval(form, env=env)),
+        ("call",        lambda: alvin.call("inc", 41, env=env))
+    ]: print(f"{label:<18} {rate(function):8.0f} calls/s")
+
+
+
+if __name__ == "__main__": main()
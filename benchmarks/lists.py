@@ -0,0 +1,67 @@
+"""Walking and rebuilding a list recursively, with shared list cells and with copied Python lists."""
+
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+import keywords as kw
+import datatypes as dt
+
+
+
+# Tail-recursive, so that the evaluator runs them in constant space; rebuilding reverses, so it is done twice
+PROGRAM = """
+(def walk (l total) (cond ((null? l) total) (else (walk (cdr l) (+ total (car l))))))
+(def rebuild (l acc) (cond ((null? l) acc) (else (rebuild (cdr l) (cons (+ 1 (car l)) acc)))))
+"""
+
+
+
+def measure(data: list) -> float:
+    """Time in seconds to walk `data` and rebuild it."""
+
+    cf.config.ENV.assign("data", data)
+
+    start = time.perf_counter()
+    ev.run(prs.parse("(walk (rebuild (rebuild data '()) '()) 0)"))
+
+    return time.perf_counter() - start
+
+
+def copied(data: list) -> float:
+    """Measure with `cons` and `cdr` copying Python lists, as the keywords used to."""
+
+    cons, tail = kw.REGULAR["cons"], kw.tail
+    kw.REGULAR["cons"], kw.tail = lambda x, y: [x] + y, lambda x, n=1: x[n:]
+
+    try: return measure(data)
+    finally: kw.REGULAR["cons"], kw.tail = cons, tail
+
+
+def main() -> None:
+    """Walk and rebuild lists of increasing length; copying is quadratic, so the longest list is only shared."""
+
+    cf.config.initialize({})
+
+    for form in prs.read(PROGRAM): ev.run(form)
+
+    for size in (1000, 10000, 100000):
+
+        shared = measure(dt.List.of(range(size)))
+
+        if size > 10000: print(f"size {size:<7} copied {'-':>9}     shared {shared:8.3f} s"); continue
+
+        before = copied([*range(size)])
+
+        print(f"size {size:<7} copied {before:9.3f} s   shared {shared:8.3f} s   speedup {before/shared:6.1f}x")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,59 @@
+"""Cold versus warm loading of examples/lisp.alv through the compiled parse cache."""
+
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import cache as cc
+import config as cf
+
+
+
+def measure(location: str, warm: bool, repeat: int) -> float:
+    """Average time in seconds to obtain the parsed expressions of `location`."""
+
+    total = 0
+
+    for _ in range(repeat):
+
+        # A cold load has no cache file to read
+        warm or os.path.exists(cc.path(location)) and os.remove(cc.path(location))
+
+        start = time.perf_counter()
+        cc.load(location)
+        total += time.perf_counter() - start
+
+    return total / repeat
+
+
+def main(repeat: int = 20) -> None:
+    """Compare cold and warm loads of lisp.alv and of a much larger file made from copies of it."""
+
+    cf.config.initialize({})
+
+    source = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../examples/lisp.alv")).read()
+    directory = tempfile.mkdtemp()
+
+    try:
+        for copies in (1, 100):
+
+            location = os.path.join(directory, f"lisp_{copies}.alv")
+            with open(location, "w") as file: file.write(source * copies)
+
+            cold, warm = measure(location, False, repeat), measure(location, True, repeat)
+
+            print(f"lisp.alv x{copies:<4} cold {cold*1000:9.3f} ms   warm {warm*1000:9.3f} ms   speedup {cold/warm:6.1f}x")
+
+        print(f"\ncache hits {cf.config.CACHE_HITS}, misses {cf.config.CACHE_MISSES}")
+
+    finally: shutil.rmtree(directory)
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,48 @@
+"""Variable lookup in deep environments, by shallow binding and by searching the scopes."""
+
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import environment as env
+
+
+
+def measure(lookup: callable, var: str, repeat: int) -> float:
+    """Average time in microseconds of one lookup of `var`."""
+
+    start = time.perf_counter()
+    for _ in range(repeat): lookup(var)
+    return (time.perf_counter() - start) / repeat * 10**6
+
+
+def main(repeat: int = 10**4) -> None:
+    """Look up a global variable from beneath an increasing number of scopes."""
+
+    cf.config.initialize({})
+
+    for depth in (10, 100, 1000, 10000):
+
+        ENV = env.Environment([{ "x" : 0 }])
+        for n in range(depth): ENV.begin_scope(); ENV.assign("n", n)
+
+        # Searching walks a list of the scopes, innermost first, until one declares the variable
+        scopes = [*ENV]
+
+        def search(var: str) -> any:
+            for scope in scopes:
+                if var in scope: return scope[var]
+
+        searched = measure(search, "x", repeat)
+        shallow = measure(ENV.lookup, "x", repeat)
+
+        print(f"depth {depth:<6} searched {searched:9.3f} us   shallow {shallow:9.3f} us   speedup {searched/shallow:7.1f}x")
+
+
+
+if __name__ == "__main__": main()
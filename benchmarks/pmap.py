@@ -0,0 +1,64 @@
+"""Light work on every element of a list, with native map and a map written in Alvin, then CPU-bound
+work with map and with pmap on increasing numbers of workers."""
+
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+import datatypes as dt
+
+
+
+# A tail-recursive map written in Alvin, which builds its result backwards, and busy work for each element
+PROGRAM = """
+(def rmap (f l acc) (cond ((null? l) acc) (else (rmap f (cdr l) (cons (f (car l)) acc)))))
+(def inc (x) (+ x 1))
+(def spin (n k) (cond ((== k 0) n) (else (spin (+ n 1) (- k 1)))))
+(def work (x) (spin x 1000))
+(set data (list 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17 18 19 20 21 22 23 24 25 26 27 28 29 30 31 32))
+"""
+
+
+
+def measure(expr: str) -> float:
+    """Time in seconds to evaluate `expr`."""
+    start = time.perf_counter(); ev.run(prs.parse(expr))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Compare the two maps, then map with pmap on 1, 2, 4... workers, up to the number of cores."""
+
+    cf.config.initialize({})
+
+    for form in prs.read(PROGRAM): ev.run(form)
+
+    cf.config.ENV.assign("long", dt.List.of(range(5000)))
+
+    native, alvin = measure("(map inc long)"), measure("(rmap inc long '())")
+    print(f"5000 elements     map {native:8.3f} s   Alvin map {alvin:8.3f} s   speedup {alvin/native:5.2f}x")
+
+    cores = os.cpu_count() or 1
+    serial = measure("(map work data)")
+
+    print(f"cores {cores}")
+    print(f"map               {serial:8.3f} s")
+
+    workers = 1
+    while True:
+        parallel = measure(f"(pmap work data {workers})")
+        print(f"pmap {workers:>3} workers {parallel:8.3f} s   speedup {serial/parallel:5.2f}x")
+
+        if workers >= cores: break
+        workers = min(workers * 2, cores)
+
+
+
+if __name__ == "__main__": main()
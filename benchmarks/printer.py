@@ -0,0 +1,49 @@
+"""Memory and time used to print large results with the streaming writer."""
+
+
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import parser as prs
+
+
+
+def measure(value: list, traced: bool) -> tuple:
+    """Write `value` to the null device, returning the elapsed time and the peak extra memory in bytes."""
+
+    traced and tracemalloc.start()
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as stream: prs.write(value, stream)
+    elapsed = time.perf_counter() - start
+
+    peak = tracemalloc.get_traced_memory()[1] if traced else 0
+    traced and tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main() -> None:
+    """Print flat and nested lists of increasing size."""
+
+    for size in (10**4, 10**5, 10**6, 10**7):
+
+        flat = list(range(size))
+        nested = [[i, [i, "a"], True] for i in range(size // 4)]  # four atoms each
+
+        for name, value in (("flat", flat), ("nested", nested)):
+
+            # Tracing slows writing down considerably, so time and memory are measured separately
+            elapsed, _ = measure(value, False)
+            _, peak = measure(value, size <= 10**6)
+
+            print(f"{name:<7}{size:>10,} atoms   {elapsed:8.3f} s   peak extra memory {f"{peak/1024:.0f} KiB" if peak else "(not traced)"}")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,49 @@
+"""Beginning and ending scopes in deep environments, with linked frames and with copied lists.
+\nCopying a list of fewer than about 30 scopes is as fast as linking a frame, so the two only diverge beyond
+that depth, where copying grows with the number of scopes and linking does not."""
+
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import environment as env
+
+
+
+def linked(ENV: "env.Environment", repeat: int) -> None:
+    """Begin and end a scope with the environment's own methods."""
+    for _ in range(repeat): ENV.begin_scope(); ENV.end_scope()
+
+
+def copied(scopes: list, repeat: int) -> None:
+    """Begin and end a scope by copying the list of scopes, as the environment used to."""
+    for _ in range(repeat): scopes = [{}] + scopes; scopes = scopes[1:]
+
+
+def measure(run: callable, *args) -> float:
+    """Time in seconds taken by `run`."""
+    start = time.perf_counter(); run(*args)
+    return time.perf_counter() - start
+
+
+def main(repeat: int = 10**4) -> None:
+    """Begin and end a scope beneath an increasing number of scopes."""
+
+    cf.config.initialize({})
+
+    for depth in (10, 100, 1000, 10000):
+
+        scopes = [{ "n" : n } for n in range(depth)]
+
+        before, after = measure(copied, scopes, repeat), measure(linked, env.Environment(scopes), repeat)
+
+        print(f"depth {depth:<6} copied {before/repeat*10**6:9.3f} us   linked {after/repeat*10**6:9.3f} us   speedup {before/after:7.1f}x")
+
+
+
+if __name__ == "__main__": main()
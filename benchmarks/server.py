@@ -0,0 +1,63 @@
+"""A short script run cold with its library, and sent to a server which has the library loaded already, from
+a new client process and from a client in this process."""
+
+
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src")
+sys.path.insert(0, SOURCE)
+
+import client as cl
+
+
+
+# A library of many small definitions, and a script which uses a few of them
+LIBRARY = "\n".join(f"(def f{n} (x) (+ x {n}))" for n in range(500))
+SCRIPT = "(f1 1)\n(f250 (f499 1))\n"
+
+
+def measure(function: callable, runs: int) -> float:
+    """Mean time in seconds to call `function`."""
+
+    start = time.perf_counter()
+    for _ in range(runs): function()
+
+    return (time.perf_counter() - start) / runs
+
+
+def main(runs: int = 20) -> None:
+    """Compare the time per script, with the server on two workers."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        library, script, path = f"{directory}/library.alv", f"{directory}/script.alv", f"{directory}/alvin.sock"
+
+        with open(library, "w") as file: file.write(LIBRARY)
+        with open(script, "w") as file: file.write(SCRIPT)
+
+        quiet = { "stdout" : subprocess.DEVNULL, "stderr" : subprocess.DEVNULL }
+
+        cold = measure(lambda: subprocess.run([sys.executable, f"{SOURCE}/main.py", library, script], check=True, **quiet), runs)
+
+        server = subprocess.Popen([sys.executable, f"{SOURCE}/main.py", "serve", f"--socket={path}", "--workers=2", library], **quiet)
+
+        try:
+            while not os.path.exists(path): time.sleep(0.01)
+
+            process = measure(lambda: subprocess.run([sys.executable, f"{SOURCE}/client.py", f"--socket={path}", script], check=True, **quiet), runs)
+
+            with open(os.devnull, "wb") as null: direct = measure(lambda: cl.request(script, path, null), runs * 10)
+
+        finally: server.terminate(); server.wait()
+
+    print(f"cold start        {cold*1000:8.1f} ms")
+    print(f"client process    {process*1000:8.1f} ms   speedup {cold/process:6.1f}x")
+    print(f"client in process {direct*1000:8.1f} ms   speedup {cold/direct:6.1f}x")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,40 @@
+"""Memory held while a loop creates lambdas, which used to keep every closure environment alive."""
+
+
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+
+
+
+LOOP = "(repeat {} ((lambda (x) (lambda (y) (+ x y))) 1))"
+
+
+
+def main(total: int = 10**6, steps: int = 10) -> None:
+    """Create `total` lambdas in `steps` loops, reporting memory and closures after each."""
+
+    cf.config.initialize({})
+
+    loop = prs.parse(LOOP.format(total // steps))
+
+    tracemalloc.start(); start = time.perf_counter()
+
+    for step in range(1, steps + 1):
+        ev.evaluate(loop)
+
+        print(f"lambdas {step * total // steps * 2:<8} memory {tracemalloc.get_traced_memory()[0]:9} B   live closures {len(cf.config.CLOSURES):<4} collected {cf.config.CLOSURES.collected:<8} {time.perf_counter() - start:7.1f} s")
+
+    tracemalloc.stop()
+
+
+
+if __name__ == "__main__": main()
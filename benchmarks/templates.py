@@ -0,0 +1,58 @@
+"""Bulk instantiation of a small template, the memory each instance takes, and method calls on one
+instance and across many, using the counter from examples/templates.alv."""
+
+
+
+import os
+import sys
+import time
+import tracemalloc
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src")
+sys.path.insert(0, SOURCE)
+
+import alvin
+
+
+
+COUNTER = """
+(template counter (n)
+    (func show () (show n))
+    (func inc () (update n (+ n 1))))
+"""
+
+
+def timed(function: callable) -> float:
+    """Seconds taken to call `function`."""
+
+    start = time.perf_counter(); function()
+    return time.perf_counter() - start
+
+
+def main(instances: int = 100000, calls: int = 100000) -> None:
+    """Report the rate of each operation, and the memory per instance."""
+
+    env = alvin.interpreter({ "-c" : "-c" in sys.argv })
+    alvin.eval(COUNTER, env=env)
+
+    make, numbers = alvin.eval("(lambda (x) (new counter (0)))", env=env), [*range(instances)]
+
+    created = timed(lambda: alvin.call("map", make, numbers, env=env))
+    print(f"instantiate        {instances / created:10.0f} instances/s")
+
+    tracemalloc.start()
+    kept = alvin.call("map", make, numbers[:10000], env=env)
+    print(f"memory             {tracemalloc.get_traced_memory()[0] / len(kept):10.0f} bytes/instance")
+    tracemalloc.stop(); del kept
+
+    alvin.eval("(set c (new counter (0)))", env=env)
+    single = timed(lambda: alvin.eval(f"(repeat {calls} (c inc))", env=env))
+    print(f"call one instance  {calls / single:10.0f} calls/s")
+
+    alvin.eval("(set counters (map (lambda (x) (new counter (0))) (list 1 2 3 4 5 6 7 8 9 10)))", env=env)
+    many = timed(lambda: alvin.eval(f"(repeat {calls // 10} (for-each (lambda (c) (c inc)) counters))", env=env))
+    print(f"call many          {calls / many:10.0f} calls/s")
+
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,52 @@
+"""A sum of squares, by Alvin recursion over a list and by vector arithmetic."""
+
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import config as cf
+import parser as prs
+import evaluate as ev
+import datatypes as dt
+
+
+
+# Tail-recursive, so that the evaluator runs it in constant space
+PROGRAM = """
+(def squares (l total) (cond ((null? l) total) (else (squares (cdr l) (+ total (* (car l) (car l)))))))
+"""
+
+
+
+def measure(expr: str, data: any) -> float:
+    """Time in seconds to evaluate `expr` with `data` bound to 'data'."""
+
+    cf.config.ENV.assign("data", data)
+
+    start = time.perf_counter()
+    ev.run(prs.parse(expr))
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Time both per element; recursion is linear, so it is timed on a shorter list."""
+
+    cf.config.initialize({})
+
+    for form in prs.read(PROGRAM): ev.run(form)
+
+    recursion, size = measure("(squares data 0)", dt.List.of(range(10**4))), 10**4
+    vector, length = measure("(sum (* data data))", dt.Vector.of(range(10**6))), 10**6
+
+    print(f"backend {'numpy' if dt.numpy is not None else 'array'}")
+    print(f"recursion {size:>8} elements {recursion:8.3f} s   {recursion/size*10**9:10.1f} ns/element")
+    print(f"vector    {length:>8} elements {vector:8.3f} s   {vector/length*10**9:10.1f} ns/element   speedup {recursion/size/(vector/length):8.0f}x")
+
+
+
+if __name__ == "__main__": main()
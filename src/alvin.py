@@ -0,0 +1,119 @@
+"""Library interface for running Alvin from Python.
+\nNothing is printed except by the program itself, and no file is read or written unless asked for: the
+extensions in `extensions.py` are only loaded with `extensions=True`, which also caches their compiled
+code unless `-n` is on, and `@start` blocks are only added to it with `-p`. Values are returned as
+Python values rather than text, and source can be parsed once and evaluated any number of times."""
+
+
+
+import config as cf
+import parser as prs
+import evaluate as ev
+import keywords as kw
+import datatypes as dt
+import interpreter as intrp
+
+
+
+##### Interpreters #####
+
+
+
+# Interpreter used when none is given, created on first use
+DEFAULT = None
+
+
+def interpreter(flags: dict = None, extensions: bool = False) -> cf.InterpreterContext:
+    """New interpreter, with `flags` such as `{'-c' : True}` turned on."""
+
+    context = cf.InterpreterContext()
+    context.initialize(flags or {}, extensions=extensions)
+
+    return context
+
+
+def default() -> cf.InterpreterContext:
+    """Interpreter used when none is given."""
+
+    global DEFAULT
+
+    if DEFAULT is None: DEFAULT = interpreter()
+
+    return DEFAULT
+
+
+
+##### Evaluation #####
+
+
+
+def parse(source: str) -> tuple:
+    """Parse every expression in `source` ahead of time, skipping comments."""
+
+    reader, forms = prs.Reader(), []
+
+    for line in source.splitlines():
+        for expression in map(str.strip, reader.feed(line)):
+
+            # Extensions are kept as text and registered when run, only written to extensions.py with -p
+            if expression.startswith("@start"): forms.append(expression)
+
+            else: expression and forms.append(prs.parse(expression))
+
+    if not reader.isempty(): raise SyntaxError(f"incomplete expression: {reader.flush().strip()}")
+
+    return tuple(forms)
+
+
+def eval(source: "str | tuple | any", env: cf.InterpreterContext = None) -> any:
+    """Evaluate `source` and return the value of its last expression as a Python value.
+    \n`source` is text, a tuple of forms from `parse`, or a single parsed form."""
+
+    forms = parse(source) if isinstance(source, str) else source if isinstance(source, tuple) else (source,)
+
+    return (env or default()).run(run, forms)
+
+
+def call(function: str | dt.Function, *args, env: cf.InterpreterContext = None) -> any:
+    """Call `function`, or the function or keyword it names, with Python values, and return a Python value."""
+    return (env or default()).run(apply, function, args)
+
+
+def run(forms: tuple) -> any:
+    """Evaluate each form in turn in the interpreter in use, returning the last value."""
+
+    value = None
+
+    for form in forms: value = intrp.interpreter.extend(form) if type(form) is str else ev.run(form)
+
+    return to_python(value)
+
+
+def apply(function: str | dt.Function, args: tuple) -> any:
+    """Call `function` with `args` in the interpreter in use."""
+
+    if isinstance(function, str):
+        function = dt.Symbol(function)
+        if function.kind is dt.VARIABLE: function = cf.config.ENV.lookup(function)
+
+    return to_python(next(iter(kw.applied(function, [[*map(to_alvin, args)]]))))
+
+
+
+##### Conversion #####
+
+
+
+def to_python(value: any) -> any:
+    """Python equivalent of an Alvin value: lists become Python lists and symbols strings."""
+
+    if isinstance(value, dt.LISTS): return [*map(to_python, value)]
+
+    elif isinstance(value, dt.Symbol): return str(value)
+
+    return value
+
+
+def to_alvin(value: any) -> any:
+    """Alvin equivalent of a Python value: lists and tuples become Alvin lists."""
+    return dt.List.of(map(to_alvin, value)) if isinstance(value, (list, tuple)) else value
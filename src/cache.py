@@ -0,0 +1,146 @@
+"""Compiled parse cache for .alv files, and compiled code cache for extensions, in the spirit of Python's __pycache__."""
+
+
+
+import os
+import sys
+import builtins
+import pickle
+import marshal
+import hashlib
+
+import repl as rpl
+import config as cf
+import parser as prs
+
+
+
+##### Settings #####
+
+
+
+# Cached files live in a directory next to their source
+DIRECTORY = "__alvincache__"
+
+# Bump whenever the layout of cached expressions changes
+FORMAT = 3
+
+
+
+##### Cache #####
+
+
+
+def path(location: str) -> str:
+    """Return the location of the cache file for the source at `location`."""
+    directory, name = os.path.split(location)
+    return os.path.join(directory, DIRECTORY, f"{name}c")
+
+
+def header(source: bytes) -> tuple:
+    """Key identifying a cache file: its format, the interpreter version, and a hash of the source."""
+    return (FORMAT, cf.config.VERSION, hashlib.sha256(source).hexdigest())
+
+
+def compile(source: str) -> list | None:
+    """Split `source` into complete expressions and parse them ahead of time.
+    \nExpressions are kept as strings when they have to be interpreted from text (interpreter commands,
+    extensions, atoms, syntax errors); all others are stored as parsed forms.
+    \nReturns None if the file cannot be split into expressions, in which case it should be run directly so
+    that the error is raised at the right point."""
+
+    try: expressions = [*rpl.read(source.splitlines(), True)]
+    except SyntaxError: return None
+
+    units = []
+
+    for expression in map(str.strip, expressions):
+
+        # Empty expressions have no effect
+        if expression == "": continue
+
+        # Interpreter-level syntax is never parsed
+        elif expression.startswith(("python", "@start")): units.append(expression); continue
+
+        # Leave errors to be raised when the expression is run
+        try: form = prs.parse(expression)
+        except Exception: form = None
+
+        units.append(form if isinstance(form, list) else expression)
+
+    return units
+
+
+def load(location: str) -> list | None:
+    """Return the parsed expressions of the file at `location`, from the cache if it is up to date.
+    \nReturns None if the cache is disabled or the file must be run directly."""
+
+    # Caching disabled
+    if cf.config.nFlag: return None
+
+    with open(location, "rb") as file: source = file.read()
+
+    key, cached = header(source), path(location)
+
+    # Use the cache file if its header matches
+    try:
+        with open(cached, "rb") as file:
+            if pickle.load(file) == key:
+                units = pickle.load(file)
+                cf.config.CACHE_HITS += 1
+                return units
+
+    except Exception: pass
+
+    cf.config.CACHE_MISSES += 1
+
+    units = compile(source.decode())
+
+    units is None or write(cached, key, units)
+
+    return units
+
+
+def write(cached: str, key: tuple, units: list) -> None:
+    """Atomically write a cache file, ignoring locations that are not writable."""
+
+    temporary = f"{cached}.{os.getpid()}.tmp"
+
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+
+        with open(temporary, "wb") as file:
+            pickle.dump(key, file)
+            pickle.dump(units, file, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, cached)
+
+    except OSError:
+        if os.path.exists(temporary): os.remove(temporary)
+
+
+
+##### Extensions #####
+
+
+
+def programs(location: str, sources: list) -> list:
+    """Return the Python code compiled from `sources`, pairs of a name and source read from the file at
+    `location`, from the cache if it is up to date.
+    \nBytecode differs between Python versions, so the key also holds the version in use."""
+
+    key = (*header("\0".join(map("\0".join, sources)).encode()), sys.implementation.cache_tag)
+    cached = path(location)
+
+    if not cf.config.nFlag:
+        try:
+            with open(cached, "rb") as file:
+                if pickle.load(file) == key: return marshal.loads(pickle.load(file))
+
+        except Exception: pass
+
+    compiled = [builtins.compile(source, name, "exec") for name, source in sources]
+
+    cf.config.nFlag or write(cached, key, marshal.dumps(compiled))
+
+    return compiled
@@ -0,0 +1,59 @@
+"""Thin client for an Alvin server, which forwards a file or an expression and prints the reply.
+\nIt imports nothing from the interpreter, so that it starts as fast as Python itself:
+
+    python3 client.py [--socket=PATH] file.alv
+    python3 client.py [--socket=PATH] "(+ 1 2)"
+"""
+
+
+
+import os
+import sys
+import socket
+
+
+
+##### Protocol #####
+
+
+
+# Socket used when none is given, one per user; tempfile would find the same directory, but is slow to import
+SOCKET = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"alvin-{os.getuid()}.sock")
+
+# A request is one of these headers on its own line, followed by a file path or by source, then end of file
+FILE, EVAL = b"file", b"eval"
+
+
+def request(item: str, path: str = SOCKET, output: any = None) -> None:
+    """Send a file, or otherwise an expression, to the server at `path` and copy its reply to `output`."""
+
+    output = output or sys.stdout.buffer
+
+    # Files are read by the server itself, which can use their parse cache
+    body = FILE + b"\n" + os.path.abspath(item).encode() if os.path.isfile(item) else EVAL + b"\n" + item.encode()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(body)
+        connection.shutdown(socket.SHUT_WR)
+
+        while chunk := connection.recv(65536): output.write(chunk)
+
+    output.flush()
+
+
+
+##### Main Program #####
+
+
+
+def main(args: list = sys.argv) -> None:
+    """Forward each file or expression in turn."""
+
+    path = next((arg.removeprefix("--socket=") for arg in args if arg.startswith("--socket=")), SOCKET)
+
+    for item in args[1:]: item.startswith("--socket=") or request(item, path)
+
+
+
+if __name__ == "__main__": main()
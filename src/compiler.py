@@ -0,0 +1,369 @@
+"""Closure compiler, an optional execution engine enabled with the -c flag.
+
+Each parsed form is compiled once into a tree of Python closures, one specialized closure per node,
+so running it again skips the classification and dispatch that `evaluate.evaluate` repeats every time.
+Compiled nodes remember the keyword set they were compiled against and hand their expression back
+to the interpreter if keywords have been added or deleted since."""
+
+
+
+import config as cf
+import evaluate as ev
+import keywords as kw
+import datatypes as dt
+import optimizer as opt
+
+
+
+##### Compilation #####
+
+
+
+# Compiled calls nested deeper than this are run by the interpreter, which does not use the Python stack
+LIMIT = 64
+
+
+def compile(expr: any) -> callable:
+    """Compile a parsed expression into a closure which takes no arguments and returns its value."""
+
+    # Symbols depend on the keyword set
+    if isinstance(expr, dt.Symbol): return symbol(expr)
+
+    # Numbers and booleans are constants
+    elif type(expr) in (int, float, bool): return lambda: expr
+
+    # So are folded expressions, until keywords change
+    elif type(expr) is opt.Folded: return folded(expr)
+
+    # Anything else is left to the interpreter
+    elif kw.isatom(expr): return lambda: ev.evaluate(expr)
+
+    # Empty list
+    elif kw.isnull(expr): return lambda: []
+
+    # Head is a symbol
+    elif isinstance(expr[0], dt.Symbol): return application(expr)
+
+    # Head is a literal, so the expression is a list
+    elif type(expr[0]) in (int, float, bool): return literal(expr)
+
+    # Head is another atom, such as a function object
+    elif kw.isatom(expr[0]): return lambda: ev.evaluate(expr)
+
+    # Otherwise head is a list
+    return compound(expr)
+
+
+
+##### Atoms #####
+
+
+
+def symbol(expr: str) -> callable:
+    """Variable reference or self-evaluating symbol."""
+
+    keywords, version, env = cf.config.KEYWORDS, cf.config.KEYWORDS.version, cf.config.ENV
+
+    if expr.kind is dt.VARIABLE:
+        def node(): return env.lookup(expr) if keywords.version == version else ev.evaluate(expr)
+
+    else:
+        value = kw.rebool(expr) if expr.isbool else expr
+        def node(): return value if keywords.version == version else ev.evaluate(expr)
+
+    return node
+
+
+def folded(expr: "opt.Folded") -> callable:
+    """Constant computed by the optimizer."""
+
+    keywords = cf.config.KEYWORDS
+
+    def node(): return expr.get() if keywords.version == expr.version else ev.evaluate(expr.expr)
+
+    return node
+
+
+def literal(expr: list) -> callable:
+    """List whose elements are each evaluated."""
+
+    elements = [*map(compile, expr)]
+
+    def node(): return [element() for element in elements]
+
+    return node
+
+
+
+##### Applications #####
+
+
+
+def application(expr: list) -> callable:
+    """List headed by a symbol: an imported method, a variable, or a keyword."""
+
+    HEAD, TAIL = expr[0], expr[1:]
+
+    # Evaluate methods from imported modules
+    if HEAD.isimport: return lambda: kw.run_method(HEAD, TAIL)
+
+    elif HEAD.kind is dt.VARIABLE: return variable(expr)
+
+    elif HEAD.kind is dt.KEYWORD: return keyword(expr)
+
+    # Otherwise head is a literal
+    keywords, version, node = cf.config.KEYWORDS, cf.config.KEYWORDS.version, literal(expr)
+
+    def guarded(): return node() if keywords.version == version else ev.evaluate(expr)
+
+    return guarded
+
+
+def variable(expr: list) -> callable:
+    """Call to the value of a variable, which is usually a function."""
+
+    keywords, version, env = cf.config.KEYWORDS, cf.config.KEYWORDS.version, cf.config.ENV
+
+    HEAD, TAIL, args = expr[0], expr[1:], [*map(compile, expr[1:])]
+
+    def node():
+        if keywords.version != version: return ev.evaluate(expr)
+
+        value = env.lookup(HEAD)
+
+        # Evaluate function calls with compiled arguments
+        if isinstance(value, dt.Function): return value.apply([arg() for arg in args])
+
+        # Otherwise replace the head with its value and let the interpreter handle it
+        return ev.evaluate([value, *TAIL])
+
+    return node
+
+
+def compound(expr: list) -> callable:
+    """List headed by another list, which is evaluated to find what to apply."""
+
+    head, TAIL, args = compile(expr[0]), expr[1:], [*map(compile, expr[1:])]
+
+    def node():
+        value = head()
+
+        # Leave the expression alone if its head evaluates to itself
+        if value == expr[0]: return expr
+
+        elif isinstance(value, dt.Function): return value.apply([arg() for arg in args])
+
+        return ev.evaluate([value, *TAIL])
+
+    return node
+
+
+
+##### Keywords #####
+
+
+
+def keyword(expr: list) -> callable:
+    """Keyword application, specialized for each keyword group."""
+
+    HEAD, TAIL = expr[0], expr[1:]
+
+    # Malformed expressions are left to the interpreter, so that they fail when run rather than when compiled
+    try: node = specialize(HEAD, TAIL)
+    except Exception: return lambda: ev.evaluate(expr)
+
+    keywords, version = cf.config.KEYWORDS, cf.config.KEYWORDS.version
+
+    def guarded(): return node() if keywords.version == version else ev.evaluate(expr)
+
+    return guarded
+
+
+def specialize(HEAD: str, TAIL: list) -> callable:
+    """Closure for a keyword application, chosen by keyword group."""
+
+    context = cf.CONTEXT.get()
+
+    # Regular or applicative-order n-ary functions
+    if HEAD in context.REGULAR: return regular(context.REGULAR[HEAD], [*map(compile, TAIL)])
+
+    # Irregular or normal-order n-ary functions
+    elif HEAD in context.IRREGULAR: return IRREGULAR[HEAD](*TAIL) if HEAD in IRREGULAR else call(context.IRREGULAR[HEAD], TAIL)
+
+    # Environment manipulation functions
+    elif HEAD in context.ENVIRONMENT: return ENVIRONMENT[HEAD](*TAIL) if HEAD in ENVIRONMENT else call(context.ENVIRONMENT[HEAD], TAIL)
+
+    # Boolean functions
+    elif HEAD in context.BOOLEAN: return boolean(context.BOOLEAN[HEAD], [*map(compile, TAIL)])
+
+    # Extensions
+    elif HEAD in context.EXTENSIONS: return call(context.EXTENSIONS[HEAD], TAIL)
+
+    # 'cxr' expressions
+    elif kw.iscxr(HEAD): return cxr(HEAD[1:-1], compile(TAIL[0]))
+
+    # Special forms and functions with unique evaluation requirements
+    else: return SPECIAL.get(HEAD, quote)(*TAIL)
+
+
+def call(function: callable, TAIL: list) -> callable:
+    """Keyword which receives its arguments unevaluated."""
+    return lambda: function(*TAIL)
+
+
+def regular(function: callable, args: list) -> callable:
+    """Keyword which receives its arguments evaluated, specialized for the common arities."""
+
+    match args:
+        case []: return function
+        case [x]: return lambda: function(x())
+        case [x, y]: return lambda: function(x(), y())
+
+    return lambda: function(*[arg() for arg in args])
+
+
+def boolean(function: callable, args: list) -> callable:
+    """Keyword which receives its arguments evaluated and converted to booleans."""
+    return lambda: function(*[bool(arg()) for arg in args])
+
+
+def cxr(path: str, arg: callable) -> callable:
+    """Arbitrary combination of `car` and `cdr`."""
+    return lambda: kw.evcxr(path, arg())
+
+
+
+## Special forms
+
+
+def quote(x: any, *_) -> callable:
+    """Quoted expression, which evaluates to itself."""
+    return lambda: x
+
+
+def lambda_(parameters: list, body: list) -> callable:
+    """Lambda function declaration; every function created here shares one compiled body."""
+
+    code, version = compile(body), cf.config.KEYWORDS.version
+
+    def node():
+        function = dt.Function("lambda", parameters, body)
+        function.code, function.version = code, version
+        return function
+
+    return node
+
+
+def cond(*clauses: list) -> callable:
+    """Conditional expression."""
+
+    # 'else' is checked for when compiling
+    clauses = [(None if clause[0] == "else" else compile(clause[0]), compile(clause[1])) for clause in clauses]
+
+    def node():
+        for test, body in clauses:
+            if test is None or test(): return body()
+
+        # Fail the same way the interpreter does when no clause matches
+        return kw.cond([])
+
+    return node
+
+
+def until(control: list, body: list) -> callable:
+    """Repeatedly evaluate `body` until a condition holds. Runs in a local scope."""
+
+    env, test, inc, body = cf.config.ENV, compile(control[0]), compile(control[1]), compile(body)
+
+    def logic() -> None:
+        while not test():
+            body()
+            inc()
+
+    return lambda: env.runlocal(logic)
+
+
+def new(name: str, *args: list) -> callable:
+    """Create a new template instance."""
+    return lambda: cf.config.ENV.lookup(name).new(*args)
+
+
+def isstring(*TAIL: list) -> callable:
+    """'string?' predicate on its unevaluated argument."""
+    return lambda: kw.isstring(TAIL)
+
+
+def islist(*TAIL: list) -> callable:
+    """'list?' predicate on its unevaluated argument."""
+    return lambda: kw.islist(TAIL)
+
+
+## Irregular keywords
+
+
+def repeat(number: any, body: list) -> callable:
+    """Evaluate `body` a number of times."""
+
+    number, body = compile(number), compile(body)
+
+    def node() -> None:
+        for _ in range(number()): body()
+
+    return node
+
+
+def let(bindings: list, body: list) -> callable:
+    """Bind variables and evaluate `body` in a local scope."""
+
+    env, body = cf.config.ENV, compile(body)
+    bindings = [(pair[0], compile(pair[1])) for pair in bindings]
+
+    def logic() -> any:
+        for var, value in bindings: env.assign(var, value())
+        return body()
+
+    return lambda: env.runlocal(logic)
+
+
+def do(exprlist: list, body: list) -> callable:
+    """Evaluate a series of expressions before returning the value of `body`. Runs in a local scope."""
+
+    env, exprlist, body = cf.config.ENV, [*map(compile, exprlist)], compile(body)
+
+    def logic() -> any:
+        for expr in exprlist: expr()
+        return body()
+
+    return lambda: env.runlocal(logic)
+
+
+## Environment keywords
+
+
+def set(var: str, val: any) -> callable:
+    """Assign to a variable in the current scope."""
+    env, value = cf.config.ENV, compile(val)
+    return lambda: env.assign(var, value())
+
+
+def update(var: str, val: any) -> callable:
+    """Reassign a previously declared variable."""
+    env, value = cf.config.ENV, compile(val)
+    return lambda: env.reassign(var, value())
+
+
+
+##### Collections #####
+
+
+
+# Keywords compiled into specialized closures; all others are called with their unevaluated arguments
+IRREGULAR = { "repeat" : repeat, "let" : let, "do" : do }
+
+ENVIRONMENT = { "set" : set, "update" : update }
+
+SPECIAL = {
+    "lambda"  : lambda_,    "until" : until,
+    "string?" : isstring,   "list?" : islist,
+    "cond"    : cond,       "new"   : new
+}
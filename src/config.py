@@ -1,17 +1,28 @@
-"""Globally accessible variables and config settings."""
+"""Globally accessible variables and config settings.
+\nAll the state of an interpreter lives in an `InterpreterContext`, so that independent programs can run
+in one process, each on its own thread. `config` stands for whichever context is in use."""
 
 
 
 import os
+import weakref
+import contextvars
 
+import startup as su
 import keywords as kw
+import datatypes as dt
 import environment as env
 import interpreter as intrp
 
 
 
-class Config:
-    """Config class to manage global variables and settings."""
+# Every flag, in the order they are unpacked; flags not given to `initialize` are off
+FLAGS = { '-i' : False, '-d' : False, '-p' : False, '-z' : False, '-n' : False, '-c' : False, '-O' : False }
+
+
+
+class InterpreterContext:
+    """Settings and state of one interpreter: its environment, closures, globals, imports and keywords."""
 
     def __init__(self) -> None:
         """Initialize config."""
@@ -38,12 +49,12 @@ class Config:
         self.PATH = os.path.abspath(__file__ + "/../..")
 
 
-    def initialize(self, flags: dict, prompt_symbol: str = "(α) ") -> None:
-        """Setup config."""
+    def initialize(self, flags: dict, prompt_symbol: str = "(α) ", extensions: bool = True) -> None:
+        """Setup config, loading the extensions in `extensions.py` unless `extensions` is false."""
 
         # Set flags
-        self.FLAGS = flags
-        self.iFlag, self.dFlag, self.pFlag, self.zFlag = flags.values()
+        self.FLAGS = flags = { **FLAGS, **flags }
+        self.iFlag, self.dFlag, self.pFlag, self.zFlag, self.nFlag, self.cFlag, self.OFlag = flags.values()
 
         # Prompt color changes to reflect enabled flags
         self.DEFAULT_COLOR = "purple" if self.zFlag else "gold" if self.pFlag else "blue" if self.dFlag else "red"
@@ -51,25 +62,53 @@ class Config:
         self.PROMPT_SYMBOL = prompt_symbol
         self.PROMPT = self.set_color(self.PROMPT_SYMBOL)
 
+        # Limits on how much of a nested list is displayed interactively; None shows everything
+        self.PRINT_DEPTH = None
+        self.PRINT_LENGTH = None
+
         # Track the number of programming errors by the user
         self.ERROR_COUNTER = 0
 
-        # Tracks expression comments
-        self.COMMENT_COUNTER = 0
+        # Track use of the compiled parse cache
+        self.CACHE_HITS = 0
+        self.CACHE_MISSES = 0
 
-        # Initialize extensions
+        # Track the expressions folded by the optimizer
+        self.FOLDED = 0
+
+        # Depth of compiled code running on the Python stack
+        self.DEPTH = 0
+
+        # Default number of values cached by each memoized function
+        self.MEMO_SIZE = 1024
+
+        # Whether memoized functions whose bodies have side effects are refused
+        self.MEMO_PURE = True
+
+        # Memoized functions of this interpreter, for statistics
+        self.MEMOIZED = weakref.WeakSet()
+
+        # Worker processes used by pmap, and the number of elements sent to each at a time; None splits lists evenly
+        self.PMAP_WORKERS = os.cpu_count() or 1
+        self.PMAP_CHUNK = None
+
+        # Asynchronous calls running at once, and threads available to those which block
+        self.ASYNC_LIMIT = 64
+        self.ASYNC_THREADS = 32
+
+        # Worker processes forked by the server
+        self.SERVER_WORKERS = os.cpu_count() or 1
 
-        # Save all the original extensions declared when the interpreter starts
-        self.ORIGINAL_EXTENSIONS = open(f"{self.PATH}/src/extensions.py").read()
+        # Initialize extensions
 
-        # Initialize extension log
-        self.EXTENSION_INDEX = []
+        # Source of each extension by alias, as its function's name and code, in the order they were added
+        self.EXTENSION_SOURCES = {}
 
-        # Track new extensions
-        self.EXTENSION_LOG = []
+        # Globals shared by the code of all extensions
+        self.EXTENSION_NAMESPACE = {}
 
         # Closure environments, accessed by ID
-        self.CLOSURES = {}
+        self.CLOSURES = env.Closures()
 
         # Declared global variables
         self.GLOBALS = {}
@@ -80,16 +119,17 @@ class Config:
         # The Environment
         self.ENV = env.Environment()
 
-        # Other keyword groups
-        self.REGULAR = kw.REGULAR
-        self.IRREGULAR = kw.IRREGULAR
-        self.BOOLEAN = kw.BOOLEAN
-        self.SPECIAL = kw.SPECIAL
+        # Other keyword groups, copied so that deleting a keyword only affects this interpreter
+        self.REGULAR = dict(kw.REGULAR)
+        self.IRREGULAR = dict(kw.IRREGULAR)
+        self.BOOLEAN = dict(kw.BOOLEAN)
+        self.SPECIAL = set(kw.SPECIAL)
         self.EXTENSIONS = {}
 
 
         self.ENVIRONMENT = {
             "def"      : self.ENV.define,
+            "defmemo"  : self.ENV.defmemo,
             "template" : self.ENV.deftemplate,
             "set"      : self.ENV.set,
             "update"   : self.ENV.update,
@@ -99,20 +139,32 @@ class Config:
             "delex"    : self.ENV.delex
         }
         
-        self.KEYWORDS = {
+        self.KEYWORDS = dt.Keywords({
             *self.REGULAR, 
             *self.IRREGULAR,
             *self.BOOLEAN, 
             *self.SPECIAL,
             *self.EXTENSIONS,
             *self.ENVIRONMENT
-        }
+        })
         
         # Track keywords
         self.INITIAL_KEYWORD_NUM = len(self.KEYWORDS)
 
-        # Load extensions
-        intrp.interpreter.extend(self.ORIGINAL_EXTENSIONS, False)
+        # Load the extensions in extensions.py into this interpreter, whichever is in use
+        with su.phase("extensions"): extensions and self.run(intrp.interpreter.load_extensions)
+
+
+    def run(self, function: callable, *args) -> any:
+        """Call `function` with `args` using this interpreter, and return its value.
+        \nThe call runs in a copy of the caller's context, so the caller's interpreter is unaffected and
+        other threads can run calls in their own interpreters at the same time."""
+        return contextvars.copy_context().run(self.enter, function, args)
+
+
+    def enter(self, function: callable, args: tuple) -> any:
+        """Make this interpreter the one in use for the rest of the current context and call `function`."""
+        CONTEXT.set(self); return function(*args)
 
 
     def set_color(self, text: str, color: str = None) -> str:
@@ -129,8 +181,21 @@ class Config:
 
 
 
+class Current:
+    """Stand-in for the interpreter in use, to which it forwards every attribute."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> any: return getattr(CONTEXT.get(), name)
+    def __setattr__(self, name: str, value: any) -> None: setattr(CONTEXT.get(), name, value)
+
+
+
 ##### Global Config Instantiation #####
 
 
 
-config = Config()
+# The interpreter in use; threads and contexts which have not chosen one share the first
+CONTEXT = contextvars.ContextVar("context", default=InterpreterContext())
+
+config = Current()
@@ -2,19 +2,428 @@
 
 
 
-import random
+import copy
+import array
+import operator
+import itertools
+import collections.abc
+
+# NumPy backs vectors when it is installed
+try: import numpy
+except ImportError: numpy = None
 
 import config as cf
 import parser as prs
+import compiler as cm
 import evaluate as ev
 import keywords as kw
 import environment as env
 
 
 
+##### Symbols #####
+
+
+
+# Symbol classifications
+KEYWORD, VARIABLE, LITERAL = "keyword", "variable", "literal"
+
+# Versions handed out to keyword sets as they change, unique across all sets
+VERSIONS = itertools.count(1)
+
+# IDs handed out to closables
+IDS = itertools.count(1)
+
+# Table of interned symbols
+SYMBOLS = {}
+
+# Placeholder for the free variables of a function which have not been found yet
+UNSEEN = object()
+
+
+
+class Keywords(set):
+    """Set of language keywords which records a new version whenever it changes."""
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.version = next(VERSIONS)
+
+    def add(self, x)       : super().add(x); self.version = next(VERSIONS)
+    def remove(self, x)    : super().remove(x); self.version = next(VERSIONS)
+    def discard(self, x)   : super().discard(x); self.version = next(VERSIONS)
+    def update(self, *x)   : super().update(*x); self.version = next(VERSIONS)
+    def pop(self)          : x = super().pop(); self.version = next(VERSIONS); return x
+    def clear(self)        : super().clear(); self.version = next(VERSIONS)
+
+
+
+class Symbol(str):
+    """Interned identifier which is classified once, when it is first read.
+    \nWhether a symbol names a keyword depends on the current keyword set, so that part of the
+    classification is cached against the keyword set's version and recomputed when it changes."""
+
+    __slots__ = ("isimport", "iscxr", "isnumber", "isbool", "cached")
+
+    def __new__(cls, name: str) -> "Symbol":
+        """Return the unique symbol for `name`."""
+
+        symbol = SYMBOLS.get(name)
+
+        if symbol is None:
+            symbol = super().__new__(cls, name)
+
+            # Classification that never changes
+            symbol.isimport = kw.isimport(name)
+            symbol.iscxr = kw.iscxr(name)
+            symbol.isnumber = kw.isnumber(name)
+            symbol.isbool = name in ("#t", "#f")
+
+            # The keyword set's version and the classification against it, replaced together
+            symbol.cached = (0, None)
+
+            # Another thread may have read the same name meanwhile
+            symbol = SYMBOLS.setdefault(name, symbol)
+
+        return symbol
+
+
+    @property
+    def kind(self) -> str:
+        """Return whether this symbol is a keyword, a variable, or a literal."""
+
+        keywords, (version, tag) = cf.CONTEXT.get().KEYWORDS, self.cached
+
+        if version != keywords.version:
+            tag = KEYWORD if self.iscxr or self in keywords else LITERAL if self.isnumber or self.isbool else VARIABLE
+            self.cached = (keywords.version, tag)
+        
+        return tag
+
+
+    # Symbols are immutable, and unpickling must go back through the symbol table
+    def __reduce__(self) -> tuple: return (Symbol, (str(self),))
+    def __copy__(self) -> "Symbol": return self
+    def __deepcopy__(self, memo: dict) -> "Symbol": return self
+
+
+
+##### Lists #####
+
+
+
+class List(collections.abc.Sequence):
+    """Persistent list which shares its elements with the lists it was built from.
+    \nThe elements are stored last first in a Python list of cells, of which each list sees the first `size`.
+    `cdr` is a shorter view of the same cells, and `cons` onto the longest view appends a cell, so both take
+    constant time; consing onto any other view copies the cells it sees. Cells are never changed once shared:
+    `setref` on a list whose cells are shared first gives it a copy of its own."""
+
+    __slots__ = ("cells", "size", "owner")
+
+    def __init__(self, cells: list = None, size: int = None, owner: bool = True) -> None:
+        self.cells = [] if cells is None else cells
+        self.size = len(self.cells) if size is None else size
+        self.owner = owner
+
+
+    @staticmethod
+    def of(elements: any) -> "List":
+        """Return `elements` as a list, converting any other sequence in linear time."""
+        return elements if isinstance(elements, List) else List([*elements][::-1])
+
+
+    def cons(self, x: any) -> "List":
+        """Return a list with `x` as the head and this list as the tail."""
+
+        if self.size == len(self.cells): cells = self.cells; self.owner = False
+        else: cells = self.cells[:self.size]
+
+        cells.append(x)
+
+        return List(cells, self.size + 1, cells is not self.cells)
+
+
+    def drop(self, n: int = 1) -> "List":
+        """Return the list without its first `n` elements, or the empty list if it is shorter."""
+        self.owner = False
+        return List(self.cells, max(self.size - n, 0), False)
+
+
+    def __getitem__(self, index: int | slice) -> any:
+        if isinstance(index, slice): return [*self][index]
+        if index < 0: index += self.size
+        if not 0 <= index < self.size: raise IndexError("list index out of range")
+        return self.cells[self.size - 1 - index]
+
+
+    def __setitem__(self, index: int, value: any) -> None:
+        if index < 0: index += self.size
+        if not 0 <= index < self.size: raise IndexError("list assignment index out of range")
+        if not self.owner: self.cells, self.owner = self.cells[:self.size], True
+        self.cells[self.size - 1 - index] = value
+
+
+    def __len__(self) -> int: return self.size
+    def __iter__(self) -> iter: return itertools.islice(reversed(self.cells), len(self.cells) - self.size, None)
+    def __reversed__(self) -> iter: return itertools.islice(self.cells, self.size)
+
+
+    def __eq__(self, other: any) -> bool:
+        if not isinstance(other, (list, List)): return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+
+    def __add__(self, other: any) -> "List":
+        if not isinstance(other, (list, List)): return NotImplemented
+
+        result = List.of(other)
+        for x in reversed(self): result = result.cons(x)
+
+        return result
+
+
+    def __radd__(self, other: any) -> "List": return List.of(other) + self if isinstance(other, list) else NotImplemented
+    def __mul__(self, n: int) -> "List": return List.of([*self] * n)
+    def __rmul__(self, n: int) -> "List": return self * n
+
+
+    # Lists are mutable through setref, and show like Python lists in internal output
+    __hash__ = None
+    def __repr__(self) -> str: return repr([*self])
+    def __copy__(self) -> "List": return self.drop(0)
+    def __deepcopy__(self, memo: dict) -> "List": return List([copy.deepcopy(x, memo) for x in reversed(self)])
+    def __reduce__(self) -> tuple: return (List.of, ([*self],))
+
+
+# Both kinds of list values
+LISTS = (list, List)
+
+
+
+##### Vectors #####
+
+
+
+# Elementwise operators whose results are booleans
+COMPARISONS = { operator.lt, operator.gt, operator.le, operator.ge, operator.eq, operator.ne }
+
+
+
+class Vector:
+    """Numeric vector whose arithmetic runs elementwise outside the evaluator.
+    \nVectors are backed by NumPy arrays when NumPy is installed, and otherwise by memoryviews of `array`
+    arrays, of signed integers, floats, or unsigned bytes standing for booleans. Either way, slicing a
+    vector returns a view of the same elements rather than a copy."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: any) -> None:
+        self.data = data
+
+
+    @staticmethod
+    def of(elements: any) -> "Vector":
+        """Return a new vector holding the numbers in `elements`."""
+
+        elements = [*elements]
+
+        if not all(type(x) in (int, float, bool) for x in elements): raise TypeError(f"vectors can only hold numbers: {prs.convert(elements)}")
+
+        if numpy is not None: return Vector(numpy.array(elements))
+
+        try: return Vector(memoryview(array.array(typecode(elements), elements)))
+        except OverflowError: return Vector(memoryview(array.array("d", elements)))
+
+
+    @property
+    def isbool(self) -> bool: return self.data.dtype == bool if numpy is not None else self.data.format == "B"
+
+
+    def item(self, x: any) -> int | float | bool:
+        """Return an element as the Python number it stands for."""
+        return x.item() if numpy is not None else bool(x) if self.data.format == "B" else x
+
+
+    def tolist(self) -> list:
+        """Return the elements as a Python list."""
+        return self.data.tolist() if numpy is not None or not self.isbool else [*map(bool, self.data)]
+
+
+    def combine(self, op: callable, other: any, reflected: bool = False) -> "Vector":
+        """Apply the binary operator `op` to each element and the matching element of `other`, or to
+        each element and `other` itself if it is a number."""
+
+        if isinstance(other, Vector):
+            if len(other) != len(self): raise ValueError(f"cannot combine vectors of lengths {len(self)} and {len(other)}")
+            right = other.data
+
+        elif type(other) in (int, float, bool): right = other
+
+        else: return NotImplemented
+
+        left = self.data
+        if reflected: left, right = right, left
+
+        if numpy is not None: return Vector(op(left, right))
+
+        # Without NumPy, numbers are repeated to the length of the vector
+        values = [*map(op, *(side if isinstance(side, memoryview) else itertools.repeat(side, len(self)) for side in (left, right)))]
+
+        # The type of the result follows from the operator and the operands, except for negative powers and large integers
+        kinds = { side.format if isinstance(side, memoryview) else "d" if type(side) is float else "q" for side in (left, right) }
+        code = "B" if op in COMPARISONS else "d" if op is operator.truediv or "d" in kinds else "q"
+
+        try: return Vector(memoryview(array.array(code, values)))
+        except (TypeError, OverflowError): return Vector(memoryview(array.array("d", values)))
+
+
+    ## Reductions
+
+
+    def sum(self) -> int | float: return self.data.sum().item() if numpy is not None else sum(self.data)
+    def min(self) -> int | float: return self.item(self.data.min() if numpy is not None else min(self.data))
+    def max(self) -> int | float: return self.item(self.data.max() if numpy is not None else max(self.data))
+    def mean(self) -> float: return self.data.mean().item() if numpy is not None else sum(self.data) / len(self)
+
+
+    def dot(self, other: "Vector") -> int | float:
+        """Return the sum of the products of matching elements."""
+
+        if len(other) != len(self): raise ValueError(f"cannot combine vectors of lengths {len(self)} and {len(other)}")
+
+        return numpy.dot(self.data, other.data).item() if numpy is not None else sum(map(operator.mul, self.data, other.data))
+
+
+    ## Sequence behaviour
+
+
+    def __len__(self) -> int: return len(self.data)
+    def __iter__(self) -> iter: return iter(self.tolist())
+
+
+    def __getitem__(self, index: int | slice) -> any:
+        return Vector(self.data[index]) if isinstance(index, slice) else self.item(self.data[index])
+
+
+    def __setitem__(self, index: int, value: int | float | bool) -> None:
+        if numpy is not None: self.data[index] = value
+        else: self.data[index] = { "B" : int, "q" : int, "d" : float }[self.data.format](value)
+
+
+    # Elementwise arithmetic and comparisons
+    def __add__(self, other)       : return self.combine(operator.add, other)
+    def __radd__(self, other)      : return self.combine(operator.add, other, True)
+    def __sub__(self, other)       : return self.combine(operator.sub, other)
+    def __rsub__(self, other)      : return self.combine(operator.sub, other, True)
+    def __mul__(self, other)       : return self.combine(operator.mul, other)
+    def __rmul__(self, other)      : return self.combine(operator.mul, other, True)
+    def __truediv__(self, other)   : return self.combine(operator.truediv, other)
+    def __rtruediv__(self, other)  : return self.combine(operator.truediv, other, True)
+    def __floordiv__(self, other)  : return self.combine(operator.floordiv, other)
+    def __rfloordiv__(self, other) : return self.combine(operator.floordiv, other, True)
+    def __mod__(self, other)       : return self.combine(operator.mod, other)
+    def __rmod__(self, other)      : return self.combine(operator.mod, other, True)
+    def __pow__(self, other)       : return self.combine(operator.pow, other)
+    def __rpow__(self, other)      : return self.combine(operator.pow, other, True)
+    def __lt__(self, other)        : return self.combine(operator.lt, other)
+    def __gt__(self, other)        : return self.combine(operator.gt, other)
+    def __le__(self, other)        : return self.combine(operator.le, other)
+    def __ge__(self, other)        : return self.combine(operator.ge, other)
+    def __eq__(self, other)        : return self.combine(operator.eq, other)
+    def __ne__(self, other)        : return self.combine(operator.ne, other)
+
+
+    def __bool__(self) -> bool: raise ValueError("the truth value of a vector is ambiguous; reduce it with sum, min or max first")
+
+
+    # Vectors show their elements, and copies never share them
+    __hash__ = None
+    def __str__(self) -> str: return f"#({" ".join(map(prs.convert, self.tolist()))})"
+    def __repr__(self) -> str: return str(self)
+    def __deepcopy__(self, memo: dict) -> "Vector": return Vector(self.data.copy() if numpy is not None else memoryview(array.array(self.data.format, self.data)))
+    def __reduce__(self) -> tuple: return (Vector.of, (self.tolist(),))
+
+
+
+def typecode(values: list) -> str:
+    """Return the narrowest `array` type code which holds all `values`."""
+    if all(type(x) is bool for x in values): return "B" if values else "d"
+    return "q" if all(type(x) in (int, bool) for x in values) else "d"
+
+
+# Values which are copied wherever one value could otherwise be handed out twice
+MUTABLE = (list, List, Vector)
+
+
+
+##### Closures #####
+
+
+
+# Evaluated parts of the forms whose lists are not all calls
+FORMS = {
+    "cond"   : lambda tail: [part for clause in tail for part in clause],
+    "let"    : lambda tail: [part for binding in tail[0] for part in binding] + tail[1:],
+    "do"     : lambda tail: [*tail[0], *tail[1:]],
+    "until"  : lambda tail: [*tail[0], *tail[1:]],
+    "lambda" : lambda tail: [*tail[0], *tail[1:]],
+    "def"    : lambda tail: [tail[0], *tail[1], *tail[2:]],
+    "defmemo": lambda tail: [tail[0], *tail[1], *tail[2:]]
+}
+
+
+def free(body: any, parameters: list) -> tuple | None:
+    """Return the names `body` refers to besides `parameters`, and those of them it calls.
+    \nReturns None if the body may also reach variables it does not name, by calling a parameter or a
+    computed value, which is only known when called, or by loading a file."""
+
+    bound = { *parameters, "self" }
+    names, calls, pending = set(), set(), [body]
+
+    while pending:
+        expr = pending.pop()
+
+        # Atoms
+        if not isinstance(expr, list):
+            isinstance(expr, str) and not kw.isnumber(expr) and names.add(expr)
+            continue
+
+        elif not expr: continue
+
+        HEAD, TAIL = expr[0], expr[1:]
+
+        # Quoted expressions are only evaluated by 'eval', and then all their names are visible
+        if HEAD == "quote":
+            quoted = [*TAIL]
+
+            while quoted:
+                part = quoted.pop()
+                if isinstance(part, list): quoted.extend(part)
+                elif isinstance(part, str) and not kw.isnumber(part): names.add(part)
+
+            continue
+
+        elif HEAD in FORMS:
+            try: pending.extend(FORMS[HEAD](TAIL)); continue
+            except (IndexError, TypeError): return None
+
+        # Heads are called, so they must be known before the call
+        elif isinstance(HEAD, list) or HEAD in parameters or HEAD == "load": return None
+
+        isinstance(HEAD, str) and calls.add(HEAD)
+        pending.extend(expr)
+
+    return frozenset(names - bound), frozenset(calls - bound)
+
+
+
 class Closable:
     """Parent class for all Alvin structures supporting closures, i.e. functions and templates (classes)."""
 
+    # Subclasses keep their attributes in a dictionary unless they declare slots of their own, as instances do
+    __slots__ = ()
+
     def __init__(self, name: str, parameters: list = None, body: list = None) -> None:
         """Initialize datatype and generate unique ID."""
 
@@ -22,19 +431,29 @@ class Closable:
         self.parameters = parameters or []
         self.body = body or []
 
-        # Generate randomized id
+        # Generate unique id
         self.id = self.generate_id()
 
-        # Create closed environment
-        cf.config.CLOSURES[self.id] = env.Environment()
+        # Create closed environment, which is reclaimed along with the closable
+        self.closure = env.Environment()
+        cf.config.CLOSURES.add(self)
 
 
-    def generate_id(self, k: int = 15) -> str: 
-        """Generate a randomized identification string between 0 and k digits long."""
-        return f"ID:{random.randint(0, 10**k)}.{self.type}.{self.name}"
+    def generate_id(self) -> int: 
+        """Generate an identification number, unique for the duration of the interpreter."""
+        return next(IDS)
     
 
     def __str__(self) -> str: return f"<{self.type} {self.name}>"
+
+
+    # Closables refer to their closure by ID, so copies of an environment share them
+    def __deepcopy__(self, memo: dict) -> "Closable": return self
+
+
+    # Closables sent to another process are registered there under a new ID
+    def __getstate__(self) -> dict: return dict(self.__dict__)
+    def __setstate__(self, state: dict) -> None: self.__dict__.update(state); self.id = self.generate_id(); cf.config.CLOSURES.add(self)
     
 
 
@@ -50,53 +469,247 @@ class Function(Closable):
             self.type = "function"
 
         super().__init__(name, parameters, body)
-            
-        if self.type == "lambda": self.name = f"{prs.convert(self.parameters)} {prs.convert(self.body)}" 
+
+        # Body compiled by the closure compiler, and the keyword set version it was compiled against
+        self.code, self.version = None, 0
+
+        # Variables the body refers to, found when the function is first captured
+        self.names = UNSEEN
+
+
+    @property
+    def name(self) -> str:
+        """Name of the function; lambdas are named after their parameters and body, converted when first needed."""
+        if self.title is None: self.title = f"{prs.convert(self.parameters)} {prs.convert(self.body)}"
+        return self.title
+
+
+    @name.setter
+    def name(self, name: str) -> None: self.title = None if self.type == "lambda" else name
 
 
     def eval(self, args: list) -> any:
         """Function call evaluation."""
 
-        def logic(args: list) -> any:
-            """Function evaluation logic."""
+        # Applicative order evaluation for arguments
+        return self.apply([] if args == None else kw.evlist(args))
 
-            # Match the arguments to the function to its parameters
-            cf.config.CLOSURES[self.id].match_arguments(self.parameters, args)
 
-            # Define 'self' as a special local reference to the current function
-            self.type in ('lambda', 'self') and cf.config.CLOSURES[self.id].define('self', self.parameters, self.body)
+    def apply(self, args: list) -> any:
+        """Call the function with already evaluated arguments."""
+
+        def logic(args: list) -> any:
+            """Function evaluation logic."""
 
-            # Extend the general environment with the current function's closure (i.e. FUNARGs)
-            cf.config.ENV.extend(cf.config.CLOSURES[self.id])
+            count = self.enter(args)
 
             # Evaluate the function
             try:
-                value = ev.evaluate(self.body)
-
-                # If returning a function, give it access to current closure
-                if isinstance(value, Function): cf.config.CLOSURES[value.id] = cf.config.CLOSURES[self.id].clone()
+                value = self.execute()
+                self.capture(value)
 
-            # Safely end the extended scopes and remove 'self'
-            finally:
-                cf.config.ENV.end_scope(len(cf.config.CLOSURES[self.id]))
-                self.type in ('lambda', 'self') and cf.config.CLOSURES[self.id].delete('self')
+            # Safely end the extended scopes
+            finally: self.leave(count)
 
             return value
+
+        self.check(args)
         
-        # Applicative order evaluation for arguments
-        args = [] if args == None else kw.evlist(args)
+        # Execute the actual function logic in local scope
+        return self.closure.runlocal(logic, args)
 
-        # Confirm function arity
+
+    def check(self, args: list) -> None:
+        """Confirm function arity."""
         if len(self.parameters) != len(args): 
             raise TypeError(f"{self.name} takes {len(self.parameters)} argument{"s"*bool(len(self.parameters)-1)} but {len(args)} were given")
-        
-        # Execute the actual function logic in local scope
-        return cf.config.CLOSURES[self.id].runlocal(logic, args)
+
+
+    def enter(self, args: list) -> int:
+        """Set up a call in the local scope of the function's closure, returning the number of scopes to end."""
+
+        # Match the arguments to the function to its parameters
+        self.closure.match_arguments(self.parameters, args)
+
+        # Define 'self' as a special local reference to the current function
+        self.type == 'lambda' and self.closure.store('self', self)
+
+        # Extend the general environment with the current function's closure (i.e. FUNARGs)
+        return cf.config.ENV.extend(self.closure)
+
+
+    def each(self, arguments: iter) -> iter:
+        """Call the function with each list of already evaluated `arguments` in turn, yielding the values.
+        \nThe general environment is extended with the closure once for all the calls, and each call only
+        adds the scope of its own arguments, so sequence keywords pay little more than the body per element."""
+
+        count = cf.config.ENV.extend(self.closure)
+
+        try:
+            for args in arguments:
+                self.check(args)
+
+                self.closure.begin_scope()
+                self.closure.match_arguments(self.parameters, args)
+                self.type == 'lambda' and self.closure.store('self', self)
+
+                cf.config.ENV.prepend(self.closure[0])
+
+                try: value = self.execute(); self.capture(value)
+                finally: cf.config.ENV.end_scope(); self.closure.end_scope()
+
+                yield value
+
+        finally: cf.config.ENV.end_scope(count)
+
+
+    def capture(self, value: any) -> None:
+        """If returning a function, give it access to the parts of the current closure it refers to."""
+        if isinstance(value, Function): value.closure = self.closure.enclose(value)
+
+
+    def free(self) -> tuple | None:
+        """Return the names the body refers to besides its parameters, and those of them it calls, or None
+        if the body may also reach variables it does not name (see `free`)."""
+
+        if self.names is UNSEEN: self.names = free(self.body, self.parameters)
+        return self.names
+
+
+    def leave(self, count: int) -> None:
+        """End the `count` scopes added by `enter`."""
+        cf.config.ENV.end_scope(count)
+
+
+    def execute(self) -> any:
+        """Evaluate the function body, with the closure compiler if it is enabled."""
+
+        # Compiled code runs on the Python stack, so deep recursion carries on in the interpreter
+        context = cf.CONTEXT.get()
+
+        if not context.cFlag or context.DEPTH >= cm.LIMIT: return ev.evaluate(self.body)
+
+        # Compile on first use, and again whenever keywords change
+        if self.version != context.KEYWORDS.version: self.code, self.version = cm.compile(self.body), context.KEYWORDS.version
+
+        context.DEPTH += 1
+
+        try: return self.code()
+        finally: context.DEPTH -= 1
+
+
+    # Compiled code stays behind when a function is sent to another process
+    def __getstate__(self) -> dict: return { **super().__getstate__(), "code" : None, "version" : 0 }
+
+
+
+class Memoized(Function):
+    """Function whose values are cached by its arguments, evicting the least recently used first.
+    \nLists are compared by their contents. The arguments are the whole key, so memoizing is only safe
+    if the body depends on nothing else: with dynamic scoping, reading a variable which is neither a
+    parameter nor a function, such as one of the caller's, gives stale values when that variable changes.
+    Bodies which assign, mutate, or do input or output are refused unless `dev.memo.pure` has been used
+    to allow them (see `IMPURE`)."""
+
+    # Keywords whose effects would be lost when a cached value is used instead
+    IMPURE = { "set", "update", "setref", "show", "usrin" }
+
+    def __init__(self, name: str, parameters: list = None, body: list = None, size: int = None) -> None:
+        super().__init__(name, parameters, body)
+
+        # Refuse bodies with side effects, unless they have been allowed
+        if cf.config.MEMO_PURE and (keyword := self.impure(self.body)): raise ValueError(f"cannot memoize {name}, whose body calls '{keyword}'.")
+
+        self.cache, self.size = collections.OrderedDict(), cf.config.MEMO_SIZE if size is None else int(size)
+        self.hits = self.misses = self.evictions = 0
+
+        cf.config.MEMOIZED.add(self)
+
+
+    def impure(self, body: any) -> str | None:
+        """Return the first keyword with side effects which `body` calls, or None if there is none.
+        \nQuoted lists are data and are skipped, but a quoted or bare keyword such as `'show` counts, since it
+        can be called by `map` or `for-each`; `global` only counts when it assigns."""
+
+        pending = [body]
+
+        while pending:
+            expr = pending.pop()
+            if isinstance(expr, str) and expr in self.IMPURE: return expr
+            elif not isinstance(expr, list) or not expr: continue
+            elif kw.isquote(expr): isinstance(expr[1], str) and pending.append(expr[1])
+            elif expr[0] == "global" and len(expr) > 2: return "global"
+            else: pending.extend(expr)
+
+        return None
+
+
+    def apply(self, args: list) -> any:
+        """Call the function with already evaluated arguments, unless their value is cached."""
+
+        key = self.key(args)
+        value = self.recall(key)
+
+        if value is UNSEEN: value = super().apply(args); self.remember(key, value)
+
+        return value
+
+
+    def each(self, arguments: iter) -> iter:
+        """Call the function with each list of already evaluated `arguments` in turn, through the cache."""
+        return map(self.apply, arguments)
+
+
+    def key(self, args: list) -> tuple | None:
+        """Cache key for `args`, with lists replaced by tuples, or None if an argument cannot be hashed."""
+
+        # Types are part of the key, since 1, 1.0 and #t are equal in Python
+        def freeze(x: any) -> tuple: return (list, tuple(map(freeze, x))) if isinstance(x, LISTS) else (type(x), x)
+
+        key = tuple(map(freeze, args))
+
+        try: hash(key)
+        except TypeError: return None
+
+        return key
+
+
+    def recall(self, key: tuple | None) -> any:
+        """Return the cached value for `key`, or `UNSEEN` if there is none."""
+
+        if key is None or key not in self.cache: self.misses += 1; return UNSEEN
+
+        self.hits += 1
+        self.cache.move_to_end(key)
+
+        # Every call would build a new list
+        value = self.cache[key]
+        return copy.deepcopy(value) if isinstance(value, MUTABLE) else value
+
+
+    def remember(self, key: tuple | None, value: any) -> None:
+        """Cache `value` for `key`, evicting the least recently used value if the cache is full."""
+
+        if key is None or self.size <= 0: return
+
+        self.cache[key] = copy.deepcopy(value) if isinstance(value, MUTABLE) else value
+
+        if len(self.cache) > self.size: self.cache.popitem(last=False); self.evictions += 1
+
+
+    def clear(self) -> None:
+        """Empty the cache."""
+        self.cache.clear()
+
+
+    def __setstate__(self, state: dict) -> None: super().__setstate__(state); cf.config.MEMOIZED.add(self)
 
 
 
 class Template(Closable):
-    """Template data type."""
+    """Template data type.
+    \nThe variables and methods of a template are kept in a single scope, its prototype, which all of its
+    instances share instead of each holding a copy."""
 
     def __init__(self, name: str, parameters: list = None, body: list = None) -> None:
         self.type = "template"
@@ -116,50 +729,83 @@ class Template(Closable):
                 break
 
         # Save template variables to internal environment
-        cf.config.CLOSURES[self.id].match_arguments(variables.keys(), variables.values())
+        self.closure.match_arguments(variables.keys(), variables.values())
 
         # Save template methods to internal environment
-        cf.config.CLOSURES[self.id].match_arguments(methods.keys(), methods.values())
+        self.closure.match_arguments(methods.keys(), methods.values())
+
+        # Method table shared by every instance
+        self.prototype = self.closure[0]
 
 
     def new(self, args: list) -> "Instance":
         """Create a new template instance."""
 
-        def logic(init: list) -> any:
-            """Evaluate all initialization statements."""
-            return kw.evlist(init)
-
         # Instantiate
-        newInstance = Instance(self.name, self.parameters, args)
-
-        # Inherit template variables and methods
-        cf.config.CLOSURES[newInstance.id].env += cf.config.CLOSURES[self.id].env
+        newInstance = Instance(self, args)
 
         # Run initialization function
-        self.init and cf.config.ENV.runClosed(cf.config.CLOSURES[newInstance.id], logic, self.init)
+        self.init and newInstance.run(kw.evlist, self.init)
             
         return newInstance
     
 
 
 class Instance(Closable):
-    """Instance of a template."""
+    """Instance of a template, holding only its own fields and a link to the template.
+    \nMethods and template variables are found in the template's prototype, so an instance costs a single
+    dictionary, and calling a method only makes the fields and the prototype the innermost scopes.
+    Having no closure of its own, an instance is not recorded in `CLOSURES`; its template is."""
+
+    __slots__ = ("template", "fields", "id")
 
-    def __init__(self, name: str, parameters: list, args: list) -> None:
-        self.type = "instance"
+    type = "instance"
 
-        super().__init__(name, parameters, args)
+    def __init__(self, template: Template, args: list) -> None:
+        self.template, self.id = template, next(IDS)
 
         # Match parameters to arguments
-        cf.config.CLOSURES[self.id].match_arguments(self.parameters, args)
+        self.fields = dict(zip(template.parameters, args))
+
+
+    @property
+    def name(self) -> str: return self.template.name
+
+
+    @property
+    def parameters(self) -> list: return self.template.parameters
+
+
+    @property
+    def closure(self) -> "env.Environment":
+        """Scopes seen by the instance's methods: its fields, then its template's prototype."""
+        return env.Environment([self.fields, self.template.prototype])
+
+
+    def enter(self) -> None:
+        """Make the fields and the prototype the innermost scopes of the general environment."""
+        ENV = cf.config.ENV; ENV.prepend(self.template.prototype); ENV.prepend(self.fields)
+
+
+    def leave(self) -> None:
+        """End the scopes begun by `enter`."""
+        cf.config.ENV.end_scope(2)
+
+
+    def run(self, logic: callable, *args) -> any:
+        """Call `logic` with `args` inside the instance."""
+
+        self.enter()
+
+        try: return logic(*args)
+        finally: self.leave()
    
     
     def eval(self, method: str, args: list = None):
         """Evaluate call to instance method."""
+        return self.run(lambda: cf.config.ENV.lookup(method).eval(args))
 
-        def logic(method, args: list):
-            """Method evaluation logic."""
-            return cf.config.ENV.lookup(method).eval(args)
-        
-        # Execute logic in local scope
-        return cf.config.ENV.runClosed(cf.config.CLOSURES[self.id], logic, method, args)
+
+    # Instances are pickled as their template and fields
+    def __getstate__(self) -> dict: return { "template" : self.template, "fields" : self.fields }
+    def __setstate__(self, state: dict) -> None: self.template, self.fields, self.id = state["template"], state["fields"], self.generate_id()
@@ -3,12 +3,35 @@
 
 
 import copy
-import importlib
+import weakref
+import itertools
 
 import config as cf
 import evaluate as ev
+import keywords as kw
 import datatypes as dt
-import extensions as ext
+import interpreter as intrp
+
+
+
+##### Frames #####
+
+
+
+class Frame:
+    """Link in the chain of scopes of an environment, pointing to the scope which encloses it."""
+
+    __slots__ = ("scope", "parent", "depth")
+
+
+
+def link(scope: dict, parent: Frame | None) -> Frame:
+    """Frame holding `scope` inside `parent`.
+    \nFrames are allocated afresh, which is cheaper than keeping ended ones in a pool to reuse, and filled in
+    here rather than in `Frame.__init__`, which would cost another call."""
+
+    frame = Frame(); frame.scope, frame.parent, frame.depth = scope, parent, parent.depth + 1 if parent else 1
+    return frame
 
 
 
@@ -16,144 +39,279 @@ import extensions as ext
 
 
 
+def share(value: any, memo: dict) -> any:
+    """Value to keep in a closure in place of `value`, copied only if it could change underneath the closure."""
+
+    if isinstance(value, dt.List):
+        if id(value) not in memo: memo[id(value)] = value.drop(0)
+        return memo[id(value)]
+
+    return copy.deepcopy(value, memo) if isinstance(value, dt.MUTABLE) else value
+
+
+
 class Environment:
-    """Environment data structure, represented as a stack of dictionaries."""
+    """Environment data structure, represented as a stack of dictionaries.
+    \nThe dictionaries are held in a chain of frames, innermost first, so that scopes begin and end in
+    constant time whatever the depth of the environment.
+    \nVariables are found by shallow binding: every variable has a stack of the scopes which declare it,
+    innermost last, so its current value is found in constant time however deep the environment grows.
+    The stacks are built on the first lookup and kept up to date as scopes begin and end."""
 
     def __init__(self, env: list = None) -> None:
+        self.top = None
         self.env = env or [{}]
 
+        # Innermost frame of the environment this one was last added to by `extend`, and this one's innermost frame then
+        self.extended = None
+
+
+    @property
+    def env(self) -> list:
+        """Scopes from innermost to outermost."""
+        return [*self]
+
+
+    @env.setter
+    def env(self, scopes: list) -> None:
+        """Replace all scopes; the bindings are rebuilt on the next lookup."""
+
+        self.top = None
+
+        for scope in reversed(scopes): self.top = link(scope, self.top)
+
+        self.bindings, self.occurrences = None, None
+
 
     def clone(self) -> "Environment":
-        """Returns a deep copy of the environment."""
-        return Environment(copy.deepcopy(self.env))
+        """Returns a copy of the environment, sharing what can be shared as `enclose` does."""
+        return self.capture(None)
+
+
+    def enclose(self, function: "dt.Function") -> "Environment":
+        """Returns the closure of `function` when it is returned from a call with this environment.
+        \nOnly the variables `function` can reach are copied, or every scope if those cannot be told apart."""
+
+        return self.capture(self.reach(function))
+
+
+    def capture(self, reached: set | None) -> "Environment":
+        """Returns a copy of the variables in `reached`, or of every variable if it is None.
+        \nInterpreter lists are shared, as `setref` copies their cells before changing shared ones, and so are
+        the lists inside them; only Python lists and vectors are copied in full."""
+
+        # Scopes appearing more than once are copied once, and values shared between them stay shared
+        copies, memo = {}, {}
+
+        for scope in self:
+            if id(scope) not in copies: copies[id(scope)] = { var : share(value, memo) for var, value in scope.items() if reached is None or var in reached }
+
+        return Environment([copies[id(scope)] for scope in self if copies[id(scope)] or reached is None])
+
+
+    def reach(self, function: "dt.Function") -> set | None:
+        """Names `function` can reach, including those of the functions it refers to, or None if unknown."""
+
+        reached, pending, seen = set(), [function], { id(function) }
+
+        while pending:
+            free = pending.pop().free()
+
+            if free is None: return None
+
+            names, calls = free
+            reached |= names
+
+            for var in names:
+
+                # Resolve the variable as it would be now
+                scope = self.find(var)
+                if scope is None: scope = cf.config.ENV.find(var)
+
+                value = None if scope is None else scope[var]
+
+                # Functions can reach variables of their own
+                if isinstance(value, dt.Function): id(value) in seen or (seen.add(id(value)), pending.append(value))
+
+                # Template methods run inside instances, so what they reach is not followed
+                elif isinstance(value, (dt.Template, dt.Instance)): return None
+
+                # A call to something not yet defined could reach anything
+                elif var in calls and scope is None and not (kw.iskeyword(var) or kw.isimport(var)): return None
+
+        return reached
 
 
     def begin_scope(self) -> None:
         """Begin new scope."""
-        self.env = [{}] + self.env
+
+        # Linked inline rather than with `link`, as a scope begins on every call
+        parent = self.top; frame = self.top = Frame()
+        frame.scope, frame.parent, frame.depth = {}, parent, parent.depth + 1 if parent else 1
+
+        self.bindings is None or self.push(frame.scope)
+
+
+    def prepend(self, scope: dict) -> None:
+        """Begin a scope with existing contents."""
+
+        parent = self.top; frame = self.top = Frame()
+        frame.scope, frame.parent, frame.depth = scope, parent, parent.depth + 1 if parent else 1
+
+        self.bindings is None or self.push(scope)
 
 
     def end_scope(self, n: int = 1) -> None:
         """End n scopes, by default 1."""
-        self.env = self.env[n:] if n < len(self.env) else [{}]
+
+        # Ending the innermost of several scopes is by far the most common case
+        if n == 1 and self.top.parent:
+            self.bindings is None or self.pop(self.top.scope)
+            self.top = self.top.parent; return
+
+        # Negative counts keep that many of the outermost scopes
+        if n < 0: n = max(len(self) + n, 0)
+
+        # Ending every scope leaves a single empty one
+        if n >= len(self): self.env = [{}]; return
+
+        for _ in range(n):
+            self.bindings is None or self.pop(self.top.scope)
+            self.top = self.top.parent
 
 
     def find_scope(self, var: str, scope: int = 0) -> int:
         """Find and return the index of the lowest scope in which `var` has been declared.
         \nIf not found, return -1."""
 
+        # Look through scopes
+        for index, contents in enumerate(self):
+            if index >= scope and var in contents: return index
+
         # Searched through entire environment
-        if scope == len(self.env): return -1
+        return -1
 
-        # Otherwise look through scopes
-        elif var in self.env[scope]: return scope
-        else: return self.find_scope(var, scope+1)
+
+    def find(self, var: str) -> dict | None:
+        """Return the lowest scope in which `var` has been declared, or None if not found."""
+
+        # Without bindings, look through scopes
+        if self.bindings is None: return next((scope for scope in self if var in scope), None)
+
+        stack = self.bindings.get(var)
+        return stack[-1] if stack else None
 
 
     def set(self, var: str, val: any, scope: int = 0) -> None: 
         """Assign `val` to evaluated `var` in an optional scope, by default current."""
+        self.assign(var, ev.evaluate(val), scope)
+
+
+    def assign(self, var: str, value: any, scope: int = 0) -> None:
+        """Assign an already evaluated `value` to `var` in an optional scope, by default current."""
+        self.store(var, value, scope)
+
+
+    def store(self, var: str, value: any, scope: int = 0) -> None:
+        """Store `value` as `var` in an optional scope, by default current, keeping bindings up to date."""
+
+        contents = self.top.scope if scope == 0 else self[scope]
+        declared = var in contents
 
-        # Garbage collection in case of function
-        self.cleanup(var, scope)
+        contents[var] = value
 
-        # Evaluate value and assign
-        self.env[scope][var] = ev.evaluate(val)
+        if declared or self.bindings is None: return
+
+        # A new variable in the current scope becomes its innermost binding
+        elif scope == 0 and self.occurrences[id(contents)] == 1: self.bindings.setdefault(var, []).append(contents)
+
+        # Otherwise its place among the other bindings has to be found
+        else: self.reindex(var)
 
 
     def define(self, name: str, parameters: list, body: list,) -> None:
         """Define a named function."""
-        self.env[0][name] = dt.Function(name, parameters, body)
+        self.store(name, dt.Function(name, parameters, body))
+    
+       
+    def defmemo(self, name: str, parameters: list, body: list, size: int = None) -> None:
+        """Define a named function whose values are cached, keeping at most `size` of them."""
+        self.store(name, dt.Memoized(name, parameters, body, size))
     
        
     def deftemplate(self, name: str, parameters: list, *body: list,) -> None:
         """Define a new template."""
-        self.env[0][name] = dt.Template(name, parameters, body)
+        self.store(name, dt.Template(name, parameters, body))
 
 
     def update(self, var: str, val: any) -> None | str:
         """Reassign previously declared `var` to new `val`."""
+        self.reassign(var, ev.evaluate(val))
+
+
+    def reassign(self, var: str, value: any) -> None:
+        """Reassign previously declared `var` to an already evaluated `value`."""
 
         # Locate variable
-        scope = self.find_scope(var)
+        scope = self.find(var)
 
         # If variable not found
-        if scope == -1: raise NameError(f"cannot update variable '{var}' before assignment.")
+        if scope is None: raise NameError(f"cannot update variable '{var}' before assignment.")
 
         # Otherwise reassign
-        else: self.set(var, val, scope)
+        scope[var] = value
 
 
     def delete(self, var: str, scope=0) -> None | str: 
         """Delete lowest declaration of `var` or raise `NameError`."""
 
         # Locate variable
-        scope = self.find_scope(var)
+        scope = self.find(var)
 
         # If variable not found
-        if scope == -1: raise NameError(f"cannot delete variable '{var}' before assignment.")
+        if scope is None: raise NameError(f"cannot delete variable '{var}' before assignment.")
 
-        # Garbage collection in case of function
-        self.cleanup(var, scope)
+        # Otherwise remove
+        self.unbind(var, scope)
 
-        # And remove
-        self.env[scope].pop(var)
 
+    def unbind(self, var: str, scope: dict) -> any:
+        """Remove `var` from one of the scopes, returning its value."""
 
-    def delex(self, extension: str) -> None:
-        """Delete an extension."""
-
-        # Validate that extension exists
-        valid = extension in cf.config.EXTENSIONS
+        value = scope.pop(var)
 
-        if valid:
+        if self.bindings is None: return value
 
-            # Bookend indices
-            start = end = 0
+        # Usually the innermost binding is the one removed
+        stack = self.bindings[var]
 
-            for i, (name, idx) in enumerate(cf.config.EXTENSION_INDEX):
-                end += idx
-                if name == extension: 
-                    
-                    # Remove entry from index
-                    cf.config.EXTENSION_INDEX.pop(i); break
-                start += idx
+        if self.occurrences[id(scope)] == 1 and stack[-1] is scope:
+            stack.pop()
+            stack or self.bindings.pop(var)
 
-            # Get the current contents of the extensions.py file
-            contents = open(f"{cf.config.PATH}/src/extensions.py").readlines()
-            
-            # Excise selected extension
-            contents = contents[:start] + contents[end:]    
-            
-            # Rewrite extensions.py
-            with open(f"{cf.config.PATH}/src/extensions.py", "w") as file:
-                file.writelines(contents)
-                
-            # Reload extensions to make changes visible
-            importlib.reload(ext)
+        else: self.reindex(var)
 
-            # Remove entry from log
-            cf.config.EXTENSION_LOG.remove(extension)
+        return value
 
-            # Remove entry from keywords
-            cf.config.EXTENSIONS.pop(extension)
-            cf.config.KEYWORDS.remove(extension)
 
-        else: raise NameError(f"extension '{extension}' not found.")
+    def delex(self, extension: str) -> None:
+        """Delete an extension, from the extension store as well if running with -p."""
+        intrp.interpreter.unregister(extension, True)
 
 
     def match_arguments(self, parameters: list, args: list) -> None:
         """Matches a list of parameters with a list of arguments for use in functions."""
-        for var, val in zip(parameters, args): self.env[0][var] = val
+        for var, val in zip(parameters, args): self.store(var, val)
 
 
-    def lookup(self, var: str, scope: int = 0) -> any:
+    def lookup(self, var: str) -> any:
         """Finds nearest declaration of `var`."""
 
         # Locate variable
-        scope = self.find_scope(var)
+        stack = (self.bind() if self.bindings is None else self.bindings).get(var)
 
         # If variable not found
-        if scope == -1: 
+        if not stack: 
 
             # Check if it is the name of an imported module
             if var in cf.config.IMPORTS: print(f"'{var}'{"" if cf.config.IMPORTS[var].__name__ == var else f" (or {cf.config.IMPORTS[var].__name__})"} is an imported module.")
@@ -162,7 +320,7 @@ class Environment:
             else: raise ValueError(f"variable {var} is not defined.")
 
         # Otherwise return value
-        else: return self.env[scope][var]
+        else: return stack[-1][var]
 
 
     def runlocal(self, logic: callable, *args) -> any:
@@ -182,38 +340,112 @@ class Environment:
         return value
 
 
-    def runClosed(self, closure: "Environment", logic: callable, *args) -> any:
-        """Extended version of the runLocal method which allows for the closure of a function."""
+    def extend(self, other: "Environment") -> int:
+        """Add another environment as lowest scope to current environment, returning how many scopes were added.
+        \nIf all but the innermost scope of `other` were the last scopes added, only the innermost is added again,
+        as the copies of the others beneath it would never be reached. A recursive call therefore adds one scope
+        however many calls to the same function are in progress. Frames never change once linked, so the check
+        takes constant time."""
 
-        # Extend the general environment
-        self.extend(closure)
-        self.begin_scope()
+        top = other.top
 
-        # Evaluate the passed function
-        try:
-            value = logic(*args)
+        if other.extended is not None and other.extended[0] is self.top and top.parent is other.extended[1]:
+            self.prepend(top.scope); count = 1
 
-        # Safely end the extended scopes
-        finally:
-            closure.env = self.env[:len(closure)+1]
-            self.end_scope(len(closure))
+        else:
+            scopes = [*other]
+            for scope in reversed(scopes): self.prepend(scope)
+            count = len(scopes)
 
-        return value
+        other.extended = (self.top, top)
+
+        return count
+
+
+    def replace(self, scope: dict) -> "Environment":
+        """Environment with `scope` in place of the innermost scope of this one, sharing the frames of the others."""
+
+        other = Environment.__new__(Environment)
+        other.top, other.bindings, other.occurrences, other.extended = link(scope, self.top.parent), None, None, None
+
+        return other
+
+
+    ## Shallow binding
+
+
+    def bind(self) -> dict:
+        """Build the binding stacks of all variables."""
+
+        self.bindings, self.occurrences = {}, {}
+
+        for scope in reversed(self.env): self.push(scope)
+
+        return self.bindings
+
+
+    def push(self, scope: dict) -> None:
+        """Record the variables of a scope added as the lowest scope."""
+
+        self.occurrences[id(scope)] = self.occurrences.get(id(scope), 0) + 1
+
+        for var in scope: self.bindings.setdefault(var, []).append(scope)
+
+
+    def pop(self, scope: dict) -> None:
+        """Forget the variables of a scope removed from the lowest scopes."""
 
+        # The same scope can appear several times, e.g. in the closure of a recursive function
+        count = self.occurrences.pop(id(scope)) - 1
+        if count: self.occurrences[id(scope)] = count
 
-    def extend(self, other: "Environment") -> None:
-        """Add another environment as lowest scope to current environment."""
-        self.env = other.env + self.env
+        for var in scope:
+            stack = self.bindings.get(var)
 
+            if stack and stack[-1] is scope:
+                stack.pop()
+                stack or self.bindings.pop(var)
 
-    def cleanup(self, var: str, scope: int = 0) -> None:
-        """Basic garbage collection for the closure environments attached to functions."""
+            else: self.reindex(var)
 
-        # Get the current variable; if it is a closable, remove its closure
-        current = self.env[scope].get(var, None); isinstance(current, dt.Closable) and cf.config.CLOSURES.pop(current.id) 
 
+    def reindex(self, var: str) -> None:
+        """Rebuild the binding stack of `var` from the scopes."""
 
-    def __len__(self) -> int: return len(self.env)
+        stack = [scope for scope in self if var in scope][::-1]
+
+        if stack: self.bindings[var] = stack
+        else: self.bindings.pop(var, None)
+
+
+    def __len__(self) -> int: return self.top.depth
+
+
+    def __iter__(self) -> iter:
+        """Iterate over the scopes from innermost to outermost."""
+
+        frame = self.top
+
+        while frame:
+            yield frame.scope
+            frame = frame.parent
+
+
+    def __getitem__(self, index: int | slice) -> dict | list:
+        """Scope at `index`, or a list of scopes for a slice, counting from the innermost."""
+
+        # The innermost scopes are reached without visiting the others
+        if isinstance(index, int) and 0 <= index < len(self): return next(itertools.islice(self, index, None))
+
+        elif isinstance(index, slice) and not index.start and index.step is None and (index.stop or 0) >= 0:
+            return [*itertools.islice(self, index.stop)]
+
+        return self.env[index]
+
+
+    # Environments are pickled as their scopes, and their frames and bindings rebuilt when unpickled
+    def __getstate__(self) -> dict: return { "env" : self.env }
+    def __setstate__(self, state: dict) -> None: self.top = self.extended = None; self.env = state["env"]
 
 
     def __str__(self) -> str:
@@ -227,3 +459,43 @@ class Environment:
             display += "\n"
         
         return display
+
+
+
+##### Closures #####
+
+
+
+class Closures:
+    """Closure environments of all functions and templates, accessed by ID.
+    \nEach environment is held by the closable it belongs to, which this table only refers to weakly,
+    so a closure is reclaimed along with its closable once nothing else refers to it."""
+
+    def __init__(self) -> None:
+        self.owners = weakref.WeakValueDictionary()
+        self.created = 0
+
+
+    def add(self, closable: "dt.Closable") -> None:
+        """Record a new closable."""
+        self.owners[closable.id] = closable
+        self.created += 1
+
+
+    @property
+    def collected(self) -> int:
+        """Number of closures which have been reclaimed."""
+        return self.created - len(self)
+
+
+    def items(self) -> list: return [(id, owner.closure) for id, owner in self.owners.items()]
+
+    def labels(self) -> list: return [(f"ID:{id}.{owner.type}.{owner.name}", owner.closure) for id, owner in self.owners.items()]
+
+    def __getitem__(self, id: int) -> Environment: return self.owners[id].closure
+
+    def __setitem__(self, id: int, closure: Environment) -> None: self.owners[id].closure = closure
+
+    def __contains__(self, id: int) -> bool: return id in self.owners
+
+    def __len__(self) -> int: return len(self.owners)
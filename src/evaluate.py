@@ -2,9 +2,29 @@
 
 
 
+import itertools
+
 import config as cf
+import compiler as cm
 import keywords as kw
+import optimizer as opt
 import datatypes as dt
+import environment as env
+
+
+
+##### Pending Work #####
+
+
+
+# Kinds of entries on the evaluation stack, each of which is waiting for the value of a subexpression
+ARGUMENTS, BOOLEANS, OPERATOR, CXR, CLAUSE, BINDING, SEQUENCE, ASSIGNMENT, REASSIGNMENT, REPETITION, LOOP, METHOD, CALL, SCOPE, RESIDUAL, MEMO = range(16)
+
+# Entries which only end scopes before passing their value on, so that a call beneath them is in tail position
+FRAMES = { CALL, SCOPE, RESIDUAL }
+
+# Placeholder for the value handed to an entry which has not evaluated anything yet
+NOTHING = object()
 
 
 
@@ -13,81 +33,389 @@ import datatypes as dt
 
 
 def evaluate(expr):
-    """Evaluates complete Alvin expressions."""
+    """Evaluates complete Alvin expressions.
+    \nPending work is kept on an explicit stack instead of the Python stack, so that nesting and recursion
+    are only limited by memory, and calls in tail position run in constant space (see `merge`)."""
+
+    # The interpreter in use cannot change while an expression is evaluated
+    stack, context = [], cf.CONTEXT.get()
+
+    try:
+        while True:
+
+            ## Evaluate the current expression, either directly or by scheduling its subexpressions
+
+            # Processing a single atom
+
+            # Symbols carry a cached classification
+            if isinstance(expr, dt.Symbol): value = context.ENV.lookup(expr) if expr.kind is dt.VARIABLE else kw.rebool(expr) if expr.isbool else expr
+
+            # Folded constants, unless keywords have changed since they were folded
+            elif type(expr) is opt.Folded:
+                if expr.version != context.KEYWORDS.version: expr = expr.expr; continue
+                value = expr.get()
+
+            # Integers evaluate to themselves; otherwise look up variables in environment, or return as literal
+            elif kw.isatom(expr): value = expr if type(expr) is int else context.ENV.lookup(expr) if kw.isvariable(expr) else kw.rebool(expr) if kw.isbool(expr) else expr
+
+            # Otherwise processing a list
+
+            # Empty list
+            elif kw.isnull(expr): value = []
+
+            # Head is an atom
+            elif kw.isatom(expr[0]):
+
+                # Head and tail identifiers for readability
+                HEAD, TAIL = expr[0],  expr[1:]
+
+                # Evaluate methods from imported modules
+                if kw.isimport(HEAD): value = kw.run_method(HEAD, TAIL)
+
+                # Evaluate function calls, arguments first
+                elif kw.isfunction(HEAD): stack.append([ARGUMENTS, HEAD, TAIL, []]); value = NOTHING
+
+                # Evaluate templates
+                elif kw.istemplate(HEAD):
+
+                    # Instance methods run inside the instance's closure
+                    if isinstance(HEAD, dt.Instance) and 0 < len(TAIL) < 3 and (len(TAIL) == 1 or TAIL[1] == None or isinstance(TAIL[1], list)):
+                        value = method(HEAD, TAIL[0], TAIL[1] if len(TAIL) == 2 else None, stack, context)
+
+                    else: value = HEAD.eval(*TAIL)
+
+                # If the head is a variable, replace it with its value and re-evaluate the expression
+                elif kw.isvariable(HEAD): expr = [context.ENV.lookup(HEAD), *TAIL]; continue
+
+                # If its a keyword, evaluate each group
+                elif kw.iskeyword(HEAD):
+
+                    # Regular or applicative-order n-ary functions
+                    if HEAD in context.REGULAR: stack.append([ARGUMENTS, context.REGULAR[HEAD], TAIL, []]); value = NOTHING
+
+                    # Irregular or normal-order n-ary functions
+                    elif HEAD in context.IRREGULAR:
+
+                        # Scoped forms evaluate their body in tail position
+                        if HEAD == "let" and len(TAIL) == 2 and isinstance(TAIL[0], list):
+                            context.ENV.begin_scope(); stack.append([SCOPE])
+                            if not TAIL[0]: expr = TAIL[1]; continue
+                            stack.append([BINDING, TAIL[0], 0, TAIL[1]]); expr = TAIL[0][0][1]; continue
+
+                        elif HEAD == "do" and len(TAIL) == 2 and isinstance(TAIL[0], list):
+                            context.ENV.begin_scope(); stack.append([SCOPE])
+                            if not TAIL[0]: expr = TAIL[1]; continue
+                            stack.append([SEQUENCE, TAIL[0], 0, TAIL[1]]); expr = TAIL[0][0]; continue
+
+                        elif HEAD == "repeat" and len(TAIL) == 2: stack.append([REPETITION, TAIL[1], None]); expr = TAIL[0]; continue
+
+                        value = context.IRREGULAR[HEAD](*TAIL)
+
+                    # Environment manipulation functions
+                    elif HEAD in context.ENVIRONMENT:
+
+                        # Assignments evaluate their value first
+                        if HEAD == "set" and len(TAIL) == 2: stack.append([ASSIGNMENT, TAIL[0]]); expr = TAIL[1]; continue
+                        elif HEAD == "update" and len(TAIL) == 2: stack.append([REASSIGNMENT, TAIL[0]]); expr = TAIL[1]; continue
+
+                        value = context.ENVIRONMENT[HEAD](*TAIL)
+
+                    # Boolean functions
+                    elif HEAD in context.BOOLEAN: stack.append([BOOLEANS, context.BOOLEAN[HEAD], TAIL, []]); value = NOTHING
+
+                    # Extensions
+                    elif HEAD in context.EXTENSIONS: value = context.EXTENSIONS[HEAD](*TAIL)
+
+                    # 'cxr' expressions
+                    elif kw.iscxr(HEAD): stack.append([CXR, HEAD[1:-1]]); expr = expr[1]; continue
+
+                    # Special forms and functions with unique evaluation requirements
+                    else:
+                        match HEAD:
+
+                            # Create new template instances
+                            case "new" : value = context.ENV.lookup(TAIL[0]).new(*TAIL[1:])
+
+                            # Lambda function declarations
+                            case "lambda": value = dt.Function("lambda", expr[1], expr[2])
+
+                            # Evaluate 'until' expressions in a local scope
+                            case "until":
+                                control, body = expr[1], expr[2]
+                                context.ENV.begin_scope(); stack.append([SCOPE]); stack.append([LOOP, control[0], control[1], body, 0]); expr = control[0]; continue
+
+                            # 'string' and 'list' predicates
+                            case "string?": value = kw.isstring(TAIL)
+                            case "list?":  value = kw.islist(TAIL)
+
+                            # Evaluate conditionals, the chosen clause in tail position
+                            case "cond":
+                                if not TAIL: kw.cond(TAIL)
+                                elif TAIL[0][0] == "else": expr = TAIL[0][1]; continue
+                                stack.append([CLAUSE, TAIL, 0]); expr = TAIL[0][0]; continue
+
+                            # Evaluate 'quote' expressions
+                            case _: value = expr[1]
+
+                # Otherwise head is a literal
+                else: stack.append([ARGUMENTS, None, expr, []]); value = NOTHING
+
+            # Otherwise head is a list, which is evaluated first
+            else: stack.append([OPERATOR, expr]); expr = expr[0]; continue
+
+            ## Hand the value to pending work until some of it needs another expression evaluated
+
+            while True:
+
+                # Nothing left to do
+                if not stack: return value
+
+                entry = stack[-1]; kind = entry[0]
+
+                # Collect arguments, then apply their function
+                if kind == ARGUMENTS or kind == BOOLEANS:
+                    target, exprs, values = entry[1], entry[2], entry[3]
+
+                    value is NOTHING or values.append(value)
+                    if len(values) < len(exprs): expr = exprs[len(values)]; break
+
+                    stack.pop()
+
+                    # Function calls continue with the function body
+                    if isinstance(target, dt.Function):
+                        if context.cFlag and context.DEPTH < cm.LIMIT: value = target.apply(values); continue
+
+                        # Memoized functions answer from their cache, or remember the value once the call returns
+                        if isinstance(target, dt.Memoized):
+                            key = target.key(values); value = target.recall(key)
+                            if value is not dt.UNSEEN: continue
+                            stack.append([MEMO, target, key])
+
+                        expr = call(target, values, stack, context); break
+
+                    # Elements of a literal list
+                    elif target is None: value = values
+
+                    elif kind == BOOLEANS: value = target(*[bool(arg) for arg in values])
+
+                    else: value = target(*values)
+
+                # End the scopes of a function call
+                elif kind == CALL:
+                    entry[1].capture(value)
+                    stack.pop(); entry[1].leave(entry[3]); entry[2].end_scope()
+
+                # Choose a clause of a conditional
+                elif kind == CLAUSE:
+                    clauses, index = entry[1], entry[2]
+
+                    if value: stack.pop(); expr = clauses[index][1]; break
+
+                    index += 1; entry[2] = index
+
+                    # No clause matched
+                    if index == len(clauses): stack.pop(); kw.cond([])
+
+                    elif clauses[index][0] == "else": stack.pop(); expr = clauses[index][1]; break
+
+                    expr = clauses[index][0]; break
+
+                # End a local scope
+                elif kind == SCOPE: stack.pop(); context.ENV.end_scope()
+
+                # Cache the value of a memoized call
+                elif kind == MEMO: stack.pop(); entry[1].remember(entry[2], value)
+
+                # End the merged frames of tail calls
+                elif kind == RESIDUAL:
+                    if isinstance(value, dt.Function) and entry[1] is not None: value.closure = entry[1].enclose(value)
+                    stack.pop(); unwind(entry, context)
+
+                # Replace the head of a list with its value
+                elif kind == OPERATOR:
+                    stack.pop()
+                    evaluated = [value, *entry[1][1:]]
+                    if entry[1] == evaluated: value = entry[1]
+                    else: expr = evaluated; break
+
+                # 'cxr' expressions
+                elif kind == CXR: stack.pop(); value = kw.evcxr(entry[1], value)
+
+                # Bind the variables of a 'let', then evaluate its body
+                elif kind == BINDING:
+                    bindings, index = entry[1], entry[2]
+
+                    context.ENV.assign(bindings[index][0], value)
+
+                    index += 1; entry[2] = index
+                    if index < len(bindings): expr = bindings[index][1]; break
+
+                    stack.pop(); expr = entry[3]; break
+
+                # Evaluate the expressions of a 'do', then its body
+                elif kind == SEQUENCE:
+                    exprlist, index = entry[1], entry[2] + 1
+
+                    entry[2] = index
+                    if index < len(exprlist): expr = exprlist[index]; break
+
+                    stack.pop(); expr = entry[3]; break
+
+                # Assign to or reassign a variable
+                elif kind == ASSIGNMENT: stack.pop(); context.ENV.assign(entry[1], value); value = None
+                elif kind == REASSIGNMENT: stack.pop(); context.ENV.reassign(entry[1], value); value = None
+
+                # Evaluate the body of a 'repeat' a number of times
+                elif kind == REPETITION:
+                    if entry[2] is None: entry[2] = iter(range(value))
+
+                    if next(entry[2], NOTHING) is not NOTHING: expr = entry[1]; break
+
+                    stack.pop(); value = None
+
+                # Evaluate the condition, body and increment of an 'until' in turn
+                elif kind == LOOP:
+                    phase = entry[4]; entry[4] = (phase + 1) % 3
+
+                    # Condition
+                    if phase == 0:
+                        if value: stack.pop(); value = None; continue
+                        expr = entry[3]; break
+
+                    # Body, then increment
+                    elif phase == 1: expr = entry[2]; break
+                    else: expr = entry[1]; break
+
+                # End the scopes of an instance method
+                elif kind == METHOD: stack.pop(); unwind(entry, context)
+
+    # Safely end every scope still open, as the Python stack would have
+    except BaseException as error:
+        while stack:
+            try: unwind(stack.pop(), context)
+            except Exception as replaced: error = replaced
+        raise error
+
+
+
+##### Calls #####
+
+
+
+def call(function: "dt.Function", args: list, stack: list, context: "cf.InterpreterContext") -> list:
+    """Begin a call to `function` with evaluated `args` in the interpreter `context`, returning its body for evaluation."""
+
+    function.check(args)
+
+    closure = function.closure
+
+    # A call in tail position first ends the frames it would return through
+    stack and stack[-1][0] in FRAMES and merge(function, closure, stack, context)
+
+    closure.begin_scope()
+
+    # Calls remember how many scopes they added to the general environment
+    stack.append([CALL, function, closure, function.enter(args)])
+
+    return function.body
+
+
+def method(instance: "dt.Instance", name: str, args: list | None, stack: list, context: "cf.InterpreterContext") -> any:
+    """Begin a call to an instance method inside the instance.
+    \nReturns `NOTHING` once the call is scheduled, or the value if the method is not a function."""
+
+    stack.append([METHOD, instance])
+    instance.enter()
+
+    function = context.ENV.lookup(name)
+
+    # Evaluate the arguments of the method inside the instance
+    if isinstance(function, dt.Function): stack.append([ARGUMENTS, function, [] if args == None else args, []]); return NOTHING
+
+    return function.eval(args)
+
+
+def merge(function: "dt.Function", closure: "env.Environment", stack: list, context: "cf.InterpreterContext") -> None:
+    """End the frames on top of `stack` before `function` is called in tail position.
+    \nWith dynamic scoping the callee can still see the variables of its callers, so rather than being
+    discarded they are flattened into a single residual scope, innermost first. A tail-recursive loop
+    therefore keeps one residual scope instead of a frame per iteration.
+    \nA caller's frame is kept instead if flattening it could change what the callee sees (see `mergeable`)."""
+
+    callee = { id(scope) for scope in closure }
+    parameters = { *function.parameters, "self" } if function.type == 'lambda' else { *function.parameters }
+
+    # Find the frames which can be ended; only one call is merged at a time
+    count, calls = 0, 0
+
+    for entry in reversed(stack):
+        if entry[0] not in FRAMES: break
+
+        if entry[0] == CALL:
+            if calls or not mergeable(entry[2], closure, callee, parameters): break
+            calls += 1
+
+        count += 1
+
+    if not count: return
+
+    popped = stack[-count:]; del stack[-count:]
+
+    # Scopes the frames would remove from the general environment
+    size, ENV = sum(entry[3] if entry[0] == CALL else 1 for entry in popped), context.ENV
+    removed = ENV[:size]
 
-    # Processing a single atom
+    # Flatten them, except for those the callee's closure already provides
+    residual = {}
+    for scope in reversed(removed): id(scope) in callee or residual.update(scope)
 
-    # Look up variables in environment, otherwise return as literal
-    if kw.isatom(expr): return cf.config.ENV.lookup(expr) if kw.isvariable(expr) else kw.rebool(expr) if kw.isbool(expr) else expr
+    # A function returned from the merged frames is given the outermost closure, as ending them one by one would
+    capture = popped[0][1] if popped[0][0] == RESIDUAL else None
 
-    # Otherwise processing a list
+    # End the frames, innermost first
+    for entry in reversed(popped):
 
-    # Empty list
-    elif kw.isnull(expr): return []
+        if entry[0] == CALL:
+            frame = entry[2]
 
-    # Head is an atom
-    elif kw.isatom(expr[0]):
+            if capture is None: capture = frame.replace(dict(frame[0]))
+            ENV.end_scope(entry[3])
 
-        # Head and tail identifiers for readability
-        HEAD, TAIL = expr[0],  expr[1:]
+            frame.end_scope()
 
-        # Evaluate methods from imported modules
-        if kw.isimport(HEAD): return kw.run_method(HEAD, TAIL)
+        else: ENV.end_scope()
 
-        # Evaluate function calls
-        elif kw.isfunction(HEAD): return HEAD.eval(TAIL)
+    ENV.prepend(residual)
 
-        # Evaluate templates
-        elif kw.istemplate(HEAD): return HEAD.eval(*TAIL)
-        
-        # If the head is a variable, replace it with its value and re-evaluate the expression
-        elif kw.isvariable(HEAD): return evaluate([cf.config.ENV.lookup(HEAD), *TAIL])
+    stack.append([RESIDUAL, capture])
 
-        # If its a keyword, evaluate each group
-        elif kw.iskeyword(HEAD):
-            
-            # Regular or applicative-order n-ary functions
-            if HEAD in kw.REGULAR: return kw.REGULAR[HEAD](*kw.evlist(TAIL))
 
-            # Irregular or normal-order n-ary functions
-            elif HEAD in kw.IRREGULAR: return kw.IRREGULAR[HEAD](*TAIL)
+def mergeable(frame: "env.Environment", closure: "env.Environment", callee: set, parameters: set) -> bool:
+    """Whether the frame of a call with closure `frame` can be flattened before a call with `closure`, whose
+    scopes have the ids in `callee`, without changing any variable the callee can see or reassign."""
 
-            # Environment manipulation functions
-            elif HEAD in cf.config.ENVIRONMENT: return cf.config.ENVIRONMENT[HEAD](*TAIL)
+    # A recursive call shares the closure, so the caller's older scopes would come before the residual one
+    if frame is closure: return frame[0].keys() <= parameters
 
-            # Boolean functions
-            elif HEAD in kw.BOOLEAN: return kw.BOOLEAN[HEAD](*[bool(arg) for arg in kw.evlist(TAIL)])
+    # Otherwise the closure's other scopes must be shared with the callee or hidden by its parameters
+    return all(id(scope) in callee or scope.keys() <= parameters for scope in itertools.islice(frame, 1, None))
 
-            # Extensions
-            elif HEAD in cf.config.EXTENSIONS: return cf.config.EXTENSIONS[HEAD](*TAIL)
 
-            # 'cxr' expressions
-            elif kw.iscxr(HEAD): return kw.evcxr(HEAD[1:-1], evaluate(expr[1]))
+def unwind(entry: list, context: "cf.InterpreterContext") -> None:
+    """End the scopes opened by an entry on the evaluation stack of the interpreter `context`."""
 
-            # Special forms and functions with unique evaluation requirements
-            match HEAD:
+    kind = entry[0]
 
-                # Create new template instances
-                case "new" : return cf.config.ENV.lookup(TAIL[0]).new(*TAIL[1:]) 
+    if kind == CALL: entry[1].leave(entry[3]); entry[2].end_scope()
 
-                # Lambda function declarations
-                case "lambda": return dt.Function("lambda", expr[1], expr[2])
+    elif kind == SCOPE or kind == RESIDUAL: context.ENV.end_scope()
 
-                # Evaluate 'until' expressions
-                case "until": return kw.until(expr[1][0], expr[1][1], expr[2])
+    elif kind == METHOD: entry[1].leave()
 
-                # 'string' and 'list' predicates
-                case "string?": return kw.isstring(TAIL)
-                case "list?":  return kw.islist(TAIL)
 
-                # Evaluate conditionals
-                case "cond": return kw.cond(TAIL)
+def run(expr):
+    """Evaluates a top-level expression, with the optimizer and the closure compiler if they are enabled."""
 
-                # Evaluate 'quote' expressions
-                case _: return expr[1]
-        
-        # Otherwise head is a literal
-        return kw.evlist(expr)
+    if cf.config.OFlag: expr = opt.fold(expr)
 
-    # Otherwise head is a list
-    evaluated = [evaluate(expr[0]), *expr[1:]]; return expr if expr == evaluated else evaluate(evaluated)
+    return cm.compile(expr)() if cf.config.cFlag else evaluate(expr)
@@ -1,3 +1,8 @@
+# Extensions to Alvin, loaded whenever the interpreter starts.
+# Each record begins with "#INCLUDE <name> as <alias>" followed by the code defining <name>, or with
+# "#DELETE <alias>". Running with -p appends records here; deleted and replaced extensions are dropped
+# from the file the next time it is loaded with -p.
+
 #INCLUDE loop as loop
 def loop(for_, i, in_, range_, start, stop, step, contents):
    from evaluate import evaluate
@@ -5,5 +10,3 @@ def loop(for_, i, in_, range_, start, stop, step, contents):
       evaluate(contents)
 
 
-#EXCLUDE
-EXTENSIONS = {name : fun for (name, fun) in locals().items() if callable(fun)}
@@ -0,0 +1,131 @@
+"""Images of the whole state of an interpreter, saved with `save-image` and restored with the --image flag.
+\nAn image holds the scopes of the environment, with the functions, templates and instances they refer to and
+so their closures, as well as the globals, the keyword tables, the extensions and the names of the imported
+modules, which are imported again when the image is restored."""
+
+
+
+import os
+import sys
+import mmap
+import pickle
+import hashlib
+import importlib
+
+import config as cf
+import interpreter as intrp
+
+
+
+##### Settings #####
+
+
+
+# Every image begins with these bytes, so that other files are refused before anything is unpickled
+MAGIC = b"ALVINIMG"
+
+# Bump whenever the layout of images changes
+FORMAT = 2
+
+# Keyword tables saved by name, so that keywords deleted before saving stay deleted
+GROUPS = ("REGULAR", "IRREGULAR", "BOOLEAN", "SPECIAL", "ENVIRONMENT")
+
+
+
+##### Images #####
+
+
+
+def header(payload: bytes) -> tuple:
+    """Key identifying an image: its format, the interpreter and Python versions, and a hash of its contents."""
+    return (FORMAT, cf.config.VERSION, sys.version_info[:2], hashlib.sha256(payload).hexdigest())
+
+
+def capture() -> dict:
+    """Return the state of the interpreter in use, as it is stored in an image."""
+
+    context = cf.CONTEXT.get()
+
+    return {
+        "scopes"     : context.ENV.env,
+        "globals"    : context.GLOBALS,
+        "imports"    : { alias : module.__name__ for alias, module in context.IMPORTS.items() },
+        "keywords"   : { group : [*getattr(context, group)] for group in GROUPS },
+        "extensions" : { alias : context.EXTENSION_SOURCES[alias] for alias in context.EXTENSIONS if alias in context.EXTENSION_SOURCES }
+    }
+
+
+def save(location: str) -> None:
+    """Write an image of the interpreter in use to `location`, replacing any file there atomically."""
+
+    try: payload = pickle.dumps(capture(), pickle.HIGHEST_PROTOCOL)
+    except Exception as error: raise TypeError(f"cannot save an image of this interpreter: {error}")
+
+    temporary = f"{location}.{os.getpid()}.tmp"
+
+    try:
+        with open(temporary, "wb") as file:
+            file.write(MAGIC)
+            pickle.dump(header(payload), file)
+            file.write(payload)
+
+        os.replace(temporary, location)
+
+    # Report the location asked for rather than the temporary file
+    except OSError as error: raise type(error)(error.errno, error.strerror, location) from None
+
+    finally:
+        if os.path.exists(temporary): os.remove(temporary)
+
+
+def restore(location: str) -> None:
+    """Replace the state of the interpreter in use with the image at `location`.
+    \nThe file is mapped into memory and read in one pass, and its header is checked before the rest is unpickled."""
+
+    with open(location, "rb") as file:
+
+        # Empty files cannot be mapped
+        if os.fstat(file.fileno()).st_size < len(MAGIC): raise ValueError(f"{location} is not an Alvin image")
+
+        image = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with image:
+        if image.read(len(MAGIC)) != MAGIC: raise ValueError(f"{location} is not an Alvin image")
+
+        # Truncated headers fail to unpickle
+        try: key = pickle.load(image)
+        except Exception: key = None
+
+        if not (isinstance(key, tuple) and len(key) == 4): raise ValueError(f"{location} is damaged")
+
+        with memoryview(image)[image.tell():] as payload:
+            expected = header(payload)
+
+            if key[:3] != expected[:3]: raise ValueError(f"{location} is a format {key[0]} image from Alvin v{key[1]} on Python {".".join(map(str, key[2]))}, and must be saved again")
+            if key != expected: raise ValueError(f"{location} is damaged")
+
+            # Closables register themselves with the interpreter in use as they are unpickled
+            state = pickle.loads(payload)
+
+    install(state)
+
+
+def install(state: dict) -> None:
+    """Replace the state of the interpreter in use with a state unpickled from an image."""
+
+    context = cf.CONTEXT.get()
+
+    context.ENV.env = state["scopes"]
+
+    context.GLOBALS.clear(); context.GLOBALS.update(state["globals"])
+    context.IMPORTS.clear(); context.IMPORTS.update({ alias : importlib.import_module(name) for alias, name in state["imports"].items() })
+
+    for group in GROUPS:
+        table, kept = getattr(context, group), set(state["keywords"][group])
+        for name in [*table]: name in kept or (table.pop(name) if isinstance(table, dict) else table.discard(name))
+
+    # Extensions are compiled again from their source, leaving the extension store as it is
+    context.EXTENSIONS.clear(); context.EXTENSION_SOURCES.clear(); context.EXTENSION_NAMESPACE.clear()
+    for alias, (name, source) in state["extensions"].items(): intrp.interpreter.register(name, alias, source)
+
+    context.KEYWORDS.clear(); context.KEYWORDS.update(*(getattr(context, group) for group in GROUPS), context.EXTENSIONS)
@@ -2,13 +2,14 @@
 
 
 
+import gc
 import os
+import re
 import math
-import random
-import importlib
 
+import cache as cc
 import config as cf
-import extensions as ext
+import datatypes as dt
 
 
 
@@ -29,7 +30,12 @@ class Interpreter():
             "dev.closures"  : self.show_closures,
             "dev.globals"   : self.show_globals,
             "dev.imports"   : self.show_imports,
-            "dev.env"       : self.show_env
+            "dev.env"       : self.show_env,
+            "dev.cache"     : self.show_cache,
+            "dev.optimizer" : self.show_optimizer,
+            "dev.memo"      : self.show_memo,
+            "dev.memo.clear": self.clear_memo,
+            "dev.memo.pure" : self.toggle_memo
         }
 
 
@@ -102,12 +108,16 @@ https://github.com/Antonio-Iijima/Alvin
 
     def show_closures(self) -> None:
         """Display the current closures."""
+
+        # Reclaim closures held only by reference cycles, such as recursive functions
+        gc.collect()
         
         print()
         if cf.config.CLOSURES:
-            for entry, env in cf.config.CLOSURES.items():
+            for entry, env in cf.config.CLOSURES.labels():
                 print(f"{entry}:\n{env}")  
         else: print("No function environments found.")
+        print(f"Live closures: {len(cf.config.CLOSURES)}, collected: {cf.config.CLOSURES.collected}")
         print()
               
 
@@ -140,15 +150,61 @@ https://github.com/Antonio-Iijima/Alvin
         print(cf.config.ENV)
 
 
+    def show_cache(self) -> None:
+        """Display parse cache statistics."""
+
+        print()
+        print(f"Parse cache {"disabled" if cf.config.nFlag else "enabled"}:")
+        print(f" hits   : {cf.config.CACHE_HITS}")
+        print(f" misses : {cf.config.CACHE_MISSES}")
+        print()
+
+
+    def show_memo(self) -> None:
+        """Display the caches of memoized functions."""
+
+        print()
+        if cf.config.MEMOIZED:
+            print("Memoized functions:")
+            for function in sorted(cf.config.MEMOIZED, key=lambda function: function.id):
+                print(f" {function.name} : {len(function.cache)}/{function.size} cached, {function.hits} hits, {function.misses} misses, {function.evictions} evictions")
+        else: print("No memoized functions found.")
+        print()
+
+
+    def clear_memo(self) -> None:
+        """Empty the caches of all memoized functions."""
+        for function in cf.config.MEMOIZED: function.clear()
+        print("Memoized function caches cleared.")
+
+
+    def toggle_memo(self) -> None:
+        """Switch between refusing and allowing memoized functions whose bodies have side effects."""
+        cf.config.MEMO_PURE = not cf.config.MEMO_PURE
+        print(f"Memoized functions with side effects {"refused" if cf.config.MEMO_PURE else "allowed"}.")
+
+
+    def show_optimizer(self) -> None:
+        """Display constant folding statistics."""
+
+        print()
+        print(f"Optimizer {"enabled" if cf.config.OFlag else "disabled"}:")
+        print(f" folded : {cf.config.FOLDED}")
+        print()
+
+
     def show_dev(self) -> None:
         """Display useful dev tools."""
 
         display = f"""useful tools
                 
-{cf.config.PROMPT_SYMBOL} dev.closures : closures
-{cf.config.PROMPT_SYMBOL} dev.env      : environment
-{cf.config.PROMPT_SYMBOL} dev.globals  : global variables
-{cf.config.PROMPT_SYMBOL} dev.imports  : imported modules"""
+{cf.config.PROMPT_SYMBOL} dev.cache     : parse cache
+{cf.config.PROMPT_SYMBOL} dev.closures  : closures
+{cf.config.PROMPT_SYMBOL} dev.env       : environment
+{cf.config.PROMPT_SYMBOL} dev.globals   : global variables
+{cf.config.PROMPT_SYMBOL} dev.imports   : imported modules
+{cf.config.PROMPT_SYMBOL} dev.memo      : memoized functions
+{cf.config.PROMPT_SYMBOL} dev.optimizer : constant folding"""
         
         self.text_box(display)
 
@@ -237,65 +293,122 @@ https://github.com/Antonio-Iijima/Alvin
         print()
 
         
-    def extend(self, code: str, writable: bool = True) -> None:
-        """Add extensions in Python to Alvin."""    
+    def extend(self, code: str, persistent: bool = True) -> None:
+        """Add extensions in Python to Alvin, saving them to the extension store if running with -p."""
 
-        # Segment code into list of strings by individual extension
-        include, *exclude = code.removeprefix("@start").removesuffix("@end").strip().split("#EXCLUDE")
-        
-        # Remove leading empty string
-        ext_list = include.split("#INCLUDE ")[1:]
+        # Anything after #EXCLUDE is left out
+        code = code.removeprefix("@start").removesuffix("@end").split("#EXCLUDE")[0]
 
-        # Add individual extensions
-        for extension in ext_list:
+        for kind, header, source in records(code):
 
-            # Separate <name> as <alias>
-            name, alias = extension[:extension.find("\n")].split(" as ")
+            if kind == INCLUDE:
 
-            if writable:
-                
-                extension = f"#INCLUDE {extension}\n\n\n"    
-                
-                # Get the current contents of the extensions.py file
-                contents = open(f"{cf.config.PATH}/src/extensions.py").read()
+                # Separate <name> as <alias>
+                name, alias = map(str.strip, header.split(" as "))
+                self.register(name, alias, source, persistent)
 
-                with open(f"{cf.config.PATH}/src/extensions.py", "w") as file: 
-                    file.writelines(extension + contents)
-                    
-                # Reload extension file to show changes
-                importlib.reload(ext)
+            else: self.unregister(header.strip(), persistent)
 
-            index = 0 if writable else len(cf.config.EXTENSION_LOG)
 
-            # Add entry to log
-            cf.config.EXTENSION_LOG.insert(index, (alias))
+    def register(self, name: str, alias: str, source: str, persistent: bool = False, program: "types.CodeType" = None) -> None:
+        """Compile an extension, unless its compiled `program` is given, and add its function `name` to the language as `alias`.
+        \nExtensions share one namespace, as if they were a single module, so registering one costs
+        nothing for the extensions registered already."""
 
-            # Create index entry
-            cf.config.EXTENSION_INDEX.insert(index, (alias, len(extension.splitlines())))
+        source = source.lstrip("\n").rstrip()
+
+        namespace = cf.config.EXTENSION_NAMESPACE
+        exec(program or compile(source, f"<extension {alias}>", "exec"), namespace)
+
+        if not callable(namespace.get(name)): raise NameError(f"extension '{alias}' does not define a function '{name}'.")
+
+        # A new definition of an alias moves it to the end, where it is written in the store
+        cf.config.EXTENSION_SOURCES.pop(alias, None)
+        cf.config.EXTENSION_SOURCES[alias] = (name, source)
+
+        # Add entry to keywords
+        cf.config.EXTENSIONS[alias] = namespace[name]
+        cf.config.KEYWORDS.add(alias)
+
+        persistent and cf.config.pFlag and self.save_extension(f"#{INCLUDE} {name} as {alias}\n{source}\n\n\n")
+
+
+    def unregister(self, alias: str, persistent: bool = False) -> None:
+        """Remove the extension `alias` from the language."""
+
+        if alias not in cf.config.EXTENSIONS: raise NameError(f"extension '{alias}' not found.")
+
+        cf.config.EXTENSION_SOURCES.pop(alias, None)
+        cf.config.EXTENSIONS.pop(alias)
+        cf.config.KEYWORDS.remove(alias)
+
+        persistent and cf.config.pFlag and self.save_extension(f"#{DELETE} {alias}\n\n\n")
+
+
+    def load_extensions(self) -> None:
+        """Register the extensions in the extension store, extensions.py.
+        \nThe store is a log of additions and deletions, only ever appended to; when running with -p, a store
+        holding deleted or replaced extensions is compacted once they have been read."""
+
+        location = f"{cf.config.PATH}/src/extensions.py"
+
+        try: code = open(location).read()
+        except FileNotFoundError: return
+
+        entries = [*records(code)]
+
+        # Extensions are compiled once and then read from the cache, as Python does for modules
+        included = [(f"<extension {header.split(" as ")[1].strip()}>", source.lstrip("\n").rstrip()) for kind, header, source in entries if kind == INCLUDE]
+        programs = iter(cc.programs(location, included))
+
+        replayed = 0
+
+        for kind, header, source in entries:
+            replayed += 1
+
+            if kind == INCLUDE: name, alias = map(str.strip, header.split(" as ")); self.register(name, alias, source, program=next(programs))
+
+            # Deletions of extensions which were never added are ignored
+            elif header.strip() in cf.config.EXTENSIONS: self.unregister(header.strip())
+
+        # Keep whatever comes before the first record
+        if cf.config.pFlag and replayed > len(cf.config.EXTENSION_SOURCES): self.compact_extensions(code[:RECORD.search(code).start()])
+
+
+    def save_extension(self, record: str) -> None:
+        """Append a record to the extension store in a single write, so that other interpreters' records are not mixed with it."""
+        with open(f"{cf.config.PATH}/src/extensions.py", "a") as file: file.write(record)
+
+
+    def compact_extensions(self, preamble: str) -> None:
+        """Atomically replace the extension store with one holding only the extensions registered, after `preamble`."""
+
+        location = f"{cf.config.PATH}/src/extensions.py"
+        temporary = f"{location}.{os.getpid()}.tmp"
+
+        try:
+            with open(temporary, "w") as file:
+                file.write(preamble)
+                for alias, (name, source) in cf.config.EXTENSION_SOURCES.items(): file.write(f"#{INCLUDE} {name} as {alias}\n{source}\n\n\n")
+
+            os.replace(temporary, location)
+
+        finally:
+            if os.path.exists(temporary): os.remove(temporary)
 
-            # Add entry to keywords
-            cf.config.EXTENSIONS[alias] = ext.EXTENSIONS.get(name)
-            cf.config.KEYWORDS.add(alias)
-            
 
     def exit_extensions(self) -> None:
-        """Safely save or remove any extensions added in an interactive interpreter session."""
+        """List the extensions saved in the extension store, if running with -p; nothing else is written on exit."""
 
-        # Print informational text if saving new extensions
         if cf.config.pFlag:
             print(cf.config.GOLD)
 
-            if len(cf.config.EXTENSION_LOG) > 0:
+            if cf.config.EXTENSION_SOURCES:
                 print("The following extensions have been saved:")
-                for ext in cf.config.EXTENSION_LOG: print(ext)
+                for alias in cf.config.EXTENSION_SOURCES: print(alias)
             else: print("No extensions saved.")
 
             print(cf.config.END_COLOR, end='')
-
-        # Otherwise overwrite back to original
-        else:
-            with open(f"{cf.config.PATH}/src/extensions.py", "w") as file:
-                file.writelines(cf.config.ORIGINAL_EXTENSIONS)
     
 
     def del_random_keyword(self) -> None:
@@ -312,6 +425,9 @@ https://github.com/Antonio-Iijima/Alvin
         
         keywords = [category for category in keywords if len(category) > 0]
 
+        # Only this mode needs random
+        import random
+
         print(cf.config.PURPLE, end='')
 
         if keywords:
@@ -332,4 +448,24 @@ https://github.com/Antonio-Iijima/Alvin
 
 
 
+##### Extension Store #####
+
+
+
+# Kinds of record in the extension store and in @start blocks, each beginning a line
+INCLUDE, DELETE = "INCLUDE", "DELETE"
+
+RECORD = re.compile(rf"^#({INCLUDE}|{DELETE}) (.*)$", re.M)
+
+
+def records(code: str) -> iter:
+    """Yield each record in `code` as its kind, the rest of its first line, and the source which follows it."""
+
+    matches = [*RECORD.finditer(code)]
+
+    for match, following in zip(matches, [*matches[1:], None]):
+        yield match[1], match[2], code[match.end():following.start() if following else len(code)]
+
+
+
 interpreter = Interpreter()
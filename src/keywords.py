@@ -3,9 +3,12 @@
 
 
 import re
+import pickle
+import itertools
 import importlib
 
 import repl as rpl
+import tasks as tk
 import config as cf
 import parser as prs
 import evaluate as ev
@@ -22,27 +25,27 @@ import datatypes as dt
 
 def isquote(x: str) -> bool: 
     """Unary `quote` expression predicate."""
-    return isinstance(x, list) and len(x) == 2 and x[0] == "quote"
+    return isinstance(x, dt.LISTS) and len(x) == 2 and x[0] == "quote"
 
 
 def isvariable(x: str) -> bool:
     """Unary `variable` predicate."""
-    return isatom(x) and not(iskeyword(x) or isnumber(x) or isbool(x))
+    return x.kind is dt.VARIABLE if isinstance(x, dt.Symbol) else isatom(x) and not(iskeyword(x) or isnumber(x) or isbool(x))
 
     
 def iskeyword(x: str) -> bool: 
     """Unary `keyword` predicate."""
-    return x in cf.config.KEYWORDS or iscxr(x)
+    return x.kind is dt.KEYWORD if isinstance(x, dt.Symbol) else x in cf.config.KEYWORDS or iscxr(x)
 
 
 def isimport(x: str) -> bool:
     """Unary `import` predicate."""
-    return bool(re.match(r"^[a-z, A-Z]*[.][a-z, A-Z]+$", str(x)))
+    return x.isimport if isinstance(x, dt.Symbol) else bool(re.match(r"^[a-z, A-Z]*[.][a-z, A-Z]+$", str(x)))
 
 
 def isnumber(x: str | int | float) -> bool: 
     """Unary `int` or `float` predicate."""
-    return bool(re.match(r"^[-]?[0-9]*[.]?[0-9]+$", str(x)))
+    return x.isnumber if isinstance(x, dt.Symbol) else bool(re.match(r"^[-]?[0-9]*[.]?[0-9]+$", str(x)))
 
 
 def isfunction(x: dt.Function) -> bool: 
@@ -57,12 +60,12 @@ def istemplate(x: dt.Template | dt.Instance) -> bool:
 
 def iscxr(x: str) -> bool:
     """Unary `car` and `cdr` predicate, generalized to include all abbreviated forms."""
-    return bool(re.match(r"^c[ad]+r$", str(x)))
+    return x.iscxr if isinstance(x, dt.Symbol) else bool(re.match(r"^c[ad]+r$", str(x)))
 
 
 def isatom(x: any) -> bool:
     """Unary `atom` predicate."""
-    return not isinstance(x, list)
+    return not isinstance(x, dt.LISTS)
 
     
 def isnull(x: list) -> bool:
@@ -72,12 +75,12 @@ def isnull(x: list) -> bool:
 
 def isbool(x: str) -> bool:
     """Unary `bool` predicate."""
-    return isinstance(x, bool) or x in ("#t", "#f")
+    return x.isbool if isinstance(x, dt.Symbol) else isinstance(x, bool) or x in ("#t", "#f")
 
 
 def islist(x: list) -> bool:
     """Unary `list` predicate."""
-    return isinstance(x[0], list) and len(x) == 1
+    return isinstance(x[0], dt.LISTS) and len(x) == 1
 
 
 def isstring(x: list) -> bool:
@@ -90,18 +93,19 @@ def isstring(x: list) -> bool:
 
 
 def append(x: list, y: list) -> list:
-    """Return the concatenation of `x` and `y`."""
-    return x + y
+    """Return the concatenation of `x` and `y`, which shares the elements of `y`."""
+    return dt.List.of(x) + y if isinstance(x, dt.LISTS) and isinstance(y, dt.LISTS) else x + y
 
 
-def cons(x: any, y: list) -> list:
+def cons(x: any, y: list) -> dt.List:
     """Return a list where `x` is the head and `y` is the tail."""
-    return [x] + y
+    if not isinstance(y, dt.LISTS): raise TypeError(f"unsupported argument for 'cons': {prs.convert(y)}")
+    return dt.List.of(y).cons(x)
 
 
 def show(expr: str) -> None:
     """Prints to standard output."""
-    print(prs.convert(expr))
+    print(expr) if expr is None else rpl.display(expr)
 
 
 def usrin(expr: list) -> str:
@@ -135,21 +139,41 @@ def head(x: list) -> any:
     except: raise TypeError(f"unsupported argument for 'car': {prs.convert(x)}")
 
 
-def tail(x: list) -> list:
-    """Returns the tail of a list or raises a TypeError."""
-    try: return x[1:]
+def tail(x: list, n: int = 1) -> list:
+    """Returns the list without its first `n` elements, sharing the rest, or raises a TypeError."""
+    try: return dt.List.of(x).drop(n) if isinstance(x, dt.LISTS) else x[n:]
     except: raise TypeError(f"unsupported argument for 'cdr': {prs.convert(x)}")
+
+
+def cxr(x: str) -> tuple:
+    """Return the steps of a `cxr` abbreviation, compiled once from its letters.
+    \nEach step is a number of tails to drop and whether the head is taken afterwards."""
+
+    path = PATHS.get(x)
+
+    if path is None:
+        steps, drops = [], 0
+
+        # Letters apply from last to first, and runs of tails are taken at once
+        for letter in reversed(x):
+            if letter == "d": drops += 1
+            else: steps.append((drops, True)); drops = 0
+
+        if drops: steps.append((drops, False))
+
+        path = PATHS[x] = tuple(steps)
+
+    return path
     
 
 def evcxr(x: str, output: any) -> any:
-    """Tail-recursive evaluation of `cxr` expressions (arbitrary combinations of `car` and `cdr`)."""
+    """Evaluation of `cxr` expressions (arbitrary combinations of `car` and `cdr`) along their compiled paths."""
 
-    # Return the final output if all head and tail calls have been processed
-    if not x: return output
+    for drops, car in cxr(x):
+        if drops: output = tail(output, drops)
+        if car: output = head(output)
 
-    # Otherwise call head or tail depending on the current letter of the abbreviation
-    elif x.endswith("a"): return evcxr(x.removesuffix("a"), head(output))
-    elif x.endswith("d"): return evcxr(x.removesuffix("d"), tail(output))
+    return output
 
 
 def rebool(x: str | bool) -> bool:
@@ -157,9 +181,128 @@ def rebool(x: str | bool) -> bool:
     return x == "#t" if isinstance(x, str) else x
 
 
-def lst(*x: str | int | bool) -> list:
+def lst(*x: str | int | bool) -> dt.List:
     """List type conversion."""
-    return list(x)
+    return dt.List.of(x)
+
+
+def vector(*x: int | float | bool | list) -> dt.Vector:
+    """Vector type conversion, from numbers or from a single list or vector."""
+    return dt.Vector.of(x[0] if len(x) == 1 and isinstance(x[0], (*dt.LISTS, dt.Vector)) else x)
+
+
+def subsequence(x: list | dt.Vector, start: int, end: int = None, step: int = None) -> list | dt.Vector:
+    """Elements of `x` from `start` up to `end`, every `step`; a slice of a vector is a view of it."""
+    return x[start:end:step]
+
+
+def dot(x: list | dt.Vector, y: list | dt.Vector) -> int | float:
+    """Sum of the products of matching elements."""
+    return (x if isinstance(x, dt.Vector) else vector(x)).dot(y if isinstance(y, dt.Vector) else vector(y))
+
+
+## Higher-order functions
+
+
+def applied(f: any, arguments: iter) -> iter:
+    """Values of the function or keyword `f` applied to each list of already evaluated `arguments` in turn."""
+
+    if isinstance(f, dt.Function): return f.each(arguments)
+
+    elif isinstance(f, dt.Symbol) and f in cf.config.REGULAR: return itertools.starmap(cf.config.REGULAR[f], arguments)
+    elif isinstance(f, dt.Symbol) and f in cf.config.BOOLEAN: return (cf.config.BOOLEAN[f](*map(bool, args)) for args in arguments)
+    elif isinstance(f, dt.Symbol) and iscxr(f): return (evcxr(f[1:-1], *args) for args in arguments)
+
+    raise TypeError(f"cannot apply {prs.convert(f)} as a function")
+
+
+def Alvin_map(f: any, *x: list) -> dt.List:
+    """Apply `f` to the matching elements of each list in `x`, returning the list of values."""
+    return dt.List.of(applied(f, zip(*x)))
+
+
+def Alvin_filter(f: any, x: list) -> dt.List:
+    """Return the elements of `x` for which `f` is true."""
+    return dt.List.of(element for element, keep in zip(x, applied(f, ([element] for element in x))) if keep)
+
+
+def Alvin_reduce(f: any, x: list, *initial: any) -> any:
+    """Combine the elements of `x` from left to right with `f`, starting from `initial` if it is given."""
+
+    elements = iter(x)
+
+    total = initial[0] if initial else next(elements, ev.NOTHING)
+    if total is ev.NOTHING: raise TypeError("cannot reduce an empty list without an initial value")
+
+    # Each call's arguments are only built once the previous value has been stored
+    state = [total]
+    for value in applied(f, ([state[0], element] for element in elements)): state[0] = value
+
+    return state[0]
+
+
+def for_each(f: any, *x: list) -> None:
+    """Apply `f` to the matching elements of each list in `x` for its side effects."""
+    for _ in applied(f, zip(*x)): pass
+
+
+def pmap(f: any, x: list, workers: int = None, size: int = None) -> dt.List:
+    """Map `f` over `x` in a pool of worker processes, sending them `size` elements at a time.
+    \nWorkers do not share the interpreter's memory, so `f` is sent with every chunk together with the variables,
+    globals and imports it can reach; whatever it assigns there is not seen by the caller."""
+
+    elements = [*x]
+    if not elements: return dt.List()
+
+    # By default the list is split evenly between the workers
+    workers = int(workers or cf.config.PMAP_WORKERS)
+    size = int(size or cf.config.PMAP_CHUNK or -(-len(elements) // workers))
+
+    shipped = shipment(f)
+    chunks = [elements[start:start + size] for start in range(0, len(elements), size)]
+
+    # Only imported when needed, as it is slow to import
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(min(workers, len(chunks)), initializer=pmap_worker, initargs=(cf.config.FLAGS,)) as pool:
+        return dt.List.of(itertools.chain.from_iterable(pool.map(pmap_chunk, itertools.repeat(shipped), chunks)))
+
+
+def shipment(f: any) -> bytes:
+    """Pickle `f` with the variables, globals and imports it can reach, to be applied in another process."""
+
+    reached = cf.config.ENV.reach(f) if isinstance(f, dt.Function) else set()
+
+    # Outermost scopes first, so that inner declarations win as they would in a lookup
+    variables = { var : value for scope in reversed(cf.config.ENV.env) for var, value in scope.items() if reached is None or var in reached }
+    imports = { alias : module.__name__ for alias, module in cf.config.IMPORTS.items() }
+
+    try: return pickle.dumps((f, variables, cf.config.GLOBALS, imports))
+    except Exception as error: raise TypeError(f"cannot send {prs.convert(f)} to worker processes: {error}")
+
+
+def pmap_worker(flags: dict) -> None:
+    """Set up the interpreter in a worker process, unless it was inherited from the parent."""
+    hasattr(cf.config, "ENV") or cf.config.initialize(flags)
+
+
+def pmap_chunk(shipped: bytes, chunk: list) -> list:
+    """Apply a shipped function to each element of `chunk`, in a worker process."""
+
+    f, variables, shared, imports = pickle.loads(shipped)
+
+    cf.config.GLOBALS.update(shared)
+    for alias, name in imports.items(): cf.config.IMPORTS[alias] = importlib.import_module(name)
+
+    # The shipped variables are only visible while the chunk runs
+    cf.config.ENV.begin_scope()
+
+    try:
+        for var, value in variables.items(): cf.config.ENV.assign(var, value)
+        return [*applied(f, ([element] for element in chunk))]
+
+    finally: cf.config.ENV.end_scope()
+
 
 
 ## More complex functions and special forms
@@ -221,6 +364,11 @@ def getfile(filepath: str) -> list:
     return open(filepath).readlines()
 
 
+def getvector(filepath: str) -> dt.Vector:
+    """Read a vector from a file of numbers separated by whitespace or commas."""
+    return dt.Vector.of(map(prs.retype, open(filepath).read().replace(",", " ").split()))
+
+
 def import_lib(name: str, as_: str = None, alias: str = None) -> None:
     """Import a library with an optional alias."""
 
@@ -241,22 +389,59 @@ def load(location: str) -> None:
     if not location.endswith(".alv"): raise IOError(f"ensure file extension is *.alv.")
     
     # Process file using REPL
-    with open(location, "r") as file: rpl.REPL(file.read().split("\n"), True)
+    rpl.run_file(location)
+
+
+def save_image(location: str) -> None:
+    """Save an image of the interpreter to the file at `location`, to be restored with the --image flag."""
+
+    # Images are rarely saved, so the module is only imported when needed
+    import image as im; im.save(location)
+
+
+def load_image(location: str) -> None:
+    """Replace the state of the interpreter with the image at `location`, as the --image flag does when starting."""
+    import image as im; im.restore(location)
+
+
+def resolve(imported: str) -> any:
+    """Return the attribute of an imported module or library named by `module.attribute`."""
+
+    # Divide the name into the module name and the attribute itself
+    module, attribute = imported.split(".")
+
+    return getattr(cf.config.IMPORTS[module], attribute)
 
 
 def run_method(imported: str, args: list) -> any:
     """Call a method from an imported module or library."""
 
-    # Divide the call into the module name and the method itself
-    module, method = imported.split(".")
-
     # Use the module and method strings to get the callabe function
-    imported = getattr(cf.config.IMPORTS[module], method)
+    imported = resolve(imported)
 
     # Either call the function with arguments or return it if none are provided
     return imported(*args) if callable(imported) else imported
 
 
+def async_call(imported: str, *args: any) -> tk.Task:
+    """Start calling a method from an imported module or library with evaluated `args` on the interpreter's
+    \nevent loop, returning a task whose value is collected with `await`."""
+
+    if not isimport(imported): raise TypeError(f"{prs.convert(imported)} is not an imported function")
+
+    return tk.call(imported, resolve(imported), evlist(args))
+
+
+def Alvin_await(x: any) -> any:
+    """Wait for a task to finish and return its value; other values are returned as they are."""
+    return x.result() if isinstance(x, tk.Task) else x
+
+
+def gather(*x: any) -> dt.List:
+    """Wait for each of several tasks, or a list of them, and return the list of their values."""
+    return dt.List.of(map(Alvin_await, x[0] if len(x) == 1 and isinstance(x[0], dt.LISTS) else x))
+
+
 def globals(var: str, val: any = None) -> None:
     """Define or access global variables."""
 
@@ -287,6 +472,12 @@ def subtract(x, y) : return x - y
 def mod(x, y)      : return x % y
 def increment(x)   : return x + 1
 
+# Reductions, which vectors compute without the evaluator
+def total(x)       : return x.sum() if isinstance(x, dt.Vector) else sum(x)
+def minimum(x)     : return x.min() if isinstance(x, dt.Vector) else min(x)
+def maximum(x)     : return x.max() if isinstance(x, dt.Vector) else max(x)
+def mean(x)        : return x.mean() if isinstance(x, dt.Vector) else sum(x) / len(x)
+
 # Logical functions
 def NOT(a)     : return not a
 def OR(a, b)   : return a or b
@@ -301,6 +492,10 @@ def NAND(a, b) : return not (a and b)
 
 
 
+# Compiled `cxr` paths, by the letters between 'c' and 'r'
+PATHS = {}
+
+
 # Common applicative-order functions 
 REGULAR = {
     "len"     : len,        "sort"  : sorted,
@@ -317,7 +512,16 @@ REGULAR = {
     "number?" : isnumber,   "cons"  : cons,
     "setref"  : setref,     "++"    : increment,
     "bool?"   : isbool,     "list"  : lst,
-    "usrin"   : usrin
+    "usrin"   : usrin,      "dot"   : dot,
+    "sum"     : total,      "mean"  : mean,
+    "min"     : minimum,    "max"   : maximum,
+    "vector"  : vector,     "slice" : subsequence,
+    "map"     : Alvin_map,  "pmap"  : pmap,
+    "filter"  : Alvin_filter,
+    "reduce"  : Alvin_reduce,
+    "for-each": for_each,
+    "await"   : Alvin_await,
+    "gather"  : gather,     "sleep" : tk.sleep
 }
 
 
@@ -326,7 +530,9 @@ IRREGULAR = {
     "repeat"  : repeat,       "let"     : let,          
     "do"      : do,           "eval"    : Alvin_eval,   
     "getfile" : getfile,      "global"  : globals,      
-    "import"  : import_lib,   "load"    : load
+    "import"  : import_lib,   "load"    : load,
+    "getvec"  : getvector,    "async-call" : async_call,
+    "save-image" : save_image, "load-image" : load_image
 }
 
 
@@ -4,6 +4,9 @@
 
 import sys
 
+# Imported first, so that it can time the others
+import startup as su
+
 import repl as rpl
 import config as cf
 import interpreter as intrp
@@ -17,27 +20,51 @@ import interpreter as intrp
 def main(args: list = sys.argv) -> None:
     """Main program."""
 
-    # Because implementing a language in Python is really inefficient
-    sys.setrecursionlimit(10**5)
+    su.imported()
 
     # Setup config with flags
-    cf.config.initialize({
+    with su.phase("initialize"): cf.config.initialize({
         '-i' : '-i' in sys.argv, # interactive interpreter
         '-d' : '-d' in sys.argv, # debugging
         '-p' : '-p' in sys.argv, # permanent extension changes
         '-z' : '-z' in sys.argv, # why
+        '-n' : '-n' in sys.argv, # no parse cache
+        '-c' : '-c' in sys.argv, # closure compiler
+        '-O' : '-O' in sys.argv, # constant folding
     })
 
     # Remove flags from args
-    for flag in cf.config.FLAGS: flag in args and args.remove(flag)
+    for flag in [*cf.config.FLAGS, "--startup-profile"]: flag in args and args.remove(flag)
+
+    # Limits on how much of each value is displayed interactively
+    for option, setting in (("--print-depth=", "PRINT_DEPTH"), ("--print-length=", "PRINT_LENGTH")):
+        for arg in [arg for arg in args if arg.startswith(option)]:
+            if not arg.removeprefix(option).isdigit(): print(f"usage: main.py {option}<number> [files]"); exit(2)
+            setattr(cf.config, setting, int(arg.removeprefix(option))); args.remove(arg)
+
+    # Remove the image to start from, if any, along with its flag
+    if args[-1:] == ["--image"]: print("usage: main.py --image <image> [files]"); exit(2)
+
+    image = args.pop(args.index("--image") + 1) if "--image" in args else None
+    "--image" in args and args.remove("--image")
     
     # If called with nothing else, print the version and exit
     if not (args[1:] or cf.config.iFlag): intrp.interpreter.prompt(); print(f"Alvin Programming Language version {cf.config.VERSION}"); exit()
 
+    # Restore a saved interpreter; images are only imported if needed
+    if image:
+        import image as im
+
+        with su.phase("image"):
+            try: im.restore(image)
+            except (OSError, ValueError) as e: print(f"{type(e).__name__}: {e}"); exit(1)
+
+    # Load libraries and answer requests from client.py instead; the server is only imported if needed
+    if args[1:2] == ["serve"]: import server as srv; srv.serve(args[2:]); return
+
     # Read in files if necessary
     for item in args[1:]:
-        with open(item, "r") as file:
-            rpl.REPL(file.read().splitlines(), True)
+        with su.phase(item): rpl.run_file(item)
 
     # Start interactive session
     if cf.config.iFlag:
@@ -0,0 +1,147 @@
+"""Constant folding, an optional pass enabled with the -O flag.
+
+Calls to pure keywords whose arguments are all literals are replaced, in place, by their values before
+each top-level form runs, so that loops and function bodies do not compute them again. Keywords can be
+deleted while the interpreter runs, so a folded value remembers the keyword set it was computed with and
+hands its expression back to the interpreter if keywords have changed since."""
+
+
+
+import copy
+
+import config as cf
+import parser as prs
+import keywords as kw
+import datatypes as dt
+
+
+
+##### Settings #####
+
+
+
+# Keywords with side effects, or which could give a different value each time; higher-order keywords are
+# as impure as the functions they are given, and pmap starts worker processes
+IMPURE = { "show", "usrin", "setref", "sleep", "await", "gather", "map", "filter", "reduce", "for-each", "pmap" }
+
+# Forms whose arguments are not evaluated as expressions, and so are left alone
+OPAQUE = { "quote", "template", "new", "eval", "getfile", "import", "load", "save-image", "string?", "list?" }
+
+# Positions of parameter and binding lists, which are left alone although the rest of the form is folded
+BINDINGS = { "def" : 2, "defmemo" : 2, "lambda" : 1, "let" : 1 }
+
+# Positions of lists which hold expressions but are not calls themselves; None stands for every argument
+SEQUENCES = { "do" : 1, "cond" : None }
+
+
+
+##### Folded Values #####
+
+
+
+class Folded:
+    """Value of a folded expression, which stands in for the expression while keywords are unchanged."""
+
+    __slots__ = ("value", "expr", "version")
+
+    def __init__(self, value: any, expr: list) -> None:
+        self.value, self.expr, self.version = value, expr, cf.config.KEYWORDS.version
+
+
+    def get(self) -> any:
+        """Return the value, copying lists and vectors since every evaluation of the expression would build a new one."""
+        return copy.deepcopy(self.value) if isinstance(self.value, dt.MUTABLE) else self.value
+
+
+    # Folded values are displayed as the expressions they replace
+    def __str__(self) -> str: return prs.convert(self.expr)
+    def __deepcopy__(self, memo: dict) -> "Folded": return self
+
+
+
+##### Folding #####
+
+
+
+def fold(expr: any) -> any:
+    """Fold the constant calls in `expr` in place, innermost first, and return it, or its value if it is constant."""
+
+    if not isinstance(expr, list) or opaque(expr): return expr
+
+    # Lists being folded, with the index of the next element to visit and whether the list is a call
+    stack = [[expr, 0, True]]
+
+    while stack:
+        frame = stack[-1]; node, index, call = frame
+
+        # Visit the elements first
+        if index < len(node):
+            frame[1] += 1
+            child = node[index]
+            isinstance(child, list) and not (opaque(child) or binding(node, index)) and stack.append([child, 0, not sequence(node, index)])
+            continue
+
+        stack.pop()
+
+        folded = constant(node) if call else None
+        if folded is None: continue
+
+        cf.config.FOLDED += 1
+
+        # The whole expression is constant
+        if not stack: return folded
+
+        # Replace the node in its parent, unless it is the head, which is not simply evaluated
+        parent, index = stack[-1][0], stack[-1][1] - 1
+        if index: parent[index] = folded
+
+    return expr
+
+
+def opaque(expr: list) -> bool:
+    """Whether the elements of `expr` are not all evaluated as expressions."""
+
+    HEAD = expr[0] if expr else None
+
+    return isinstance(HEAD, dt.Symbol) and (HEAD in OPAQUE or HEAD.isimport or HEAD in cf.config.EXTENSIONS)
+
+
+def binding(expr: list, index: int) -> bool:
+    """Whether the element of `expr` at `index` is a list of parameters or bindings."""
+    return index > 0 and isinstance(expr[0], dt.Symbol) and BINDINGS.get(expr[0]) == index
+
+
+def sequence(expr: list, index: int) -> bool:
+    """Whether the element of `expr` at `index` is a list of expressions rather than a call."""
+    return index > 0 and isinstance(expr[0], dt.Symbol) and expr[0] in SEQUENCES and SEQUENCES[expr[0]] in (None, index)
+
+
+def constant(expr: list) -> Folded | None:
+    """Return the folded value of a call to a pure keyword whose arguments are all literals, or None."""
+
+    if not expr: return None
+
+    HEAD, TAIL = expr[0], expr[1:]
+
+    if not (isinstance(HEAD, dt.Symbol) and HEAD.kind is dt.KEYWORD): return None
+
+    # Literal arguments
+    args = []
+
+    for arg in TAIL:
+        if type(arg) in (int, float, bool): args.append(arg)
+        elif type(arg) is Folded: args.append(arg.value)
+        elif kw.isquote(arg): args.append(arg[1])
+        else: return None
+
+    # Errors are left to be raised when the expression runs
+    try:
+        if HEAD in cf.config.REGULAR and HEAD not in IMPURE: return Folded(cf.config.REGULAR[HEAD](*args), expr)
+
+        elif HEAD in cf.config.BOOLEAN: return Folded(cf.config.BOOLEAN[HEAD](*[bool(arg) for arg in args]), expr)
+
+        elif HEAD.iscxr and HEAD not in cf.config.EXTENSIONS and len(args) == 1: return Folded(kw.evcxr(HEAD[1:-1], args[0]), expr)
+
+    except Exception: return None
+
+    return None
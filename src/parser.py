@@ -2,8 +2,12 @@
 
 
 
+import io
+import re
+
 import config as cf
 import keywords as kw
+import datatypes as dt
 
 
 
@@ -11,121 +15,184 @@ import keywords as kw
 
 
 
-## Basic syntax checking (parentheses, operators, etc.) and typing
-
+## Basic typing
 
-def iscomment(expr: str) -> bool:
-    """Checks for single- or multiline comments."""
-    return cf.config.COMMENT_COUNTER or any(comment in expr for comment in (cf.config.SINGLE_COMMENT, cf.config.MULTILINE_COMMENT_OPEN, cf.config.MULTILINE_COMMENT_CLOSE))
 
+def retype(x: str) -> int | float | bool | dt.Symbol: 
+    """Replace int, float, and bool strings with their correct data types."""
 
-def iscomplete(expr: str) -> bool:
-    """Checks for *hopefully* complete expressions in the REPL."""
+    # Replace numbers with either int or float types
+    if kw.isnumber(x): return float(x) if "." in x else int(x)
     
-    # Filter expressions that will never complete
-    if expr.count(")") > expr.count("("): raise SyntaxError(f"fatal expression: {" ".join(expr)}")
+    # Replace boolean #t and #f with the proper bool
+    elif x in ("#t", "#f"): return x == "#t"
     
-    return all(ext in expr for ext in ("@start", "@end")) or ("@start" not in expr and expr.count("(") == expr.count(")"))
+    # Otherwise intern the symbol
+    return dt.Symbol(x)
 
 
-def isperfectlybalanced(expr: list) -> bool: 
-    """Check for balanced parentheses in an Alvin expression."""
-    
-    stack = 0
 
-    for char in expr:
-        if char == "(": stack += 1
-        elif char == ")": 
-            if not stack: raise SyntaxError(f"unmatched closing parenthesis in {" ".join(expr)}")
-            else: stack -= 1
-    
-    if stack: raise SyntaxError(f"unmatched opening parenthesis in {" ".join(expr)}")
+##### Reader #####
 
 
-def syntax_check(expr: list) -> list:
-    """Checks balanced parentheses, proper expression nesting, etc. Raises errors if any conditions not met, otherwise returns `expr`."""
 
-    # Confirm balanced parentheses
-    isperfectlybalanced(expr)        
+# Newlines are kept as tokens so that source positions can be tracked in the same pass
+TOKENS = re.compile(r"\n|[()']|[^\s()']+")
 
-    return expr
 
+class Form(list):
+    """A parsed list expression which remembers where it began in the source text."""
 
-def get_opp_par(expr: list, par: str="(") -> int | bool:
-    """Get the index of the corresponding parenthesis, otherwise return False."""
+    __slots__ = ("line", "column")
 
-    stack = 0
 
-    opp = ")" if par == "(" else "("
+def read(s: str) -> list:
+    """Read every expression in `s` in a single linear pass, returning the list of top-level forms.
+    \nParentheses are matched with an explicit stack, so nesting depth is limited only by memory."""
 
-    # Iterate through the expression
-    for index, char in enumerate(expr):
-        
-        # Track opening parentheses using the stack
-        if   char == par: stack += 1
-        elif char == opp: stack -= 1
+    # Enclosing forms and their pending quote counts
+    stack = []
 
-        # Return the index once the stack is empty (i.e. found the balancing parenthesis)
-        if not stack: return index
+    # The form currently being built and the number of ' marks waiting for its next element
+    current, quoted = [], 0
 
+    # Source position of the current line
+    line, offset = 1, 0
 
-def retype(x: str) -> int | float | bool: 
-    """Replace int, float, and bool strings with their correct data types."""
+    for match in TOKENS.finditer(s):
+        token = match.group()
 
-    # Replace numbers with either int or float types
-    if kw.isnumber(x): return float(x) if "." in x else int(x)
-    
-    # Replace boolean #t and #f with the proper bool
-    elif x in ("#t", "#f"): return x == "#t"
-    
-    # Otherwise just return the original input
-    return x
+        # Track source positions
+        if token == "\n": line, offset = line + 1, match.end(); continue
 
+        # Open a new form
+        elif token == "(":
+            stack.append((current, quoted))
+            current, quoted = Form(), 0
+            current.line, current.column = line, match.start() - offset + 1
+            continue
 
-## Low-level syntax conversion
+        # Defer quotes until the next complete element
+        elif token == "'": quoted += 1; continue
 
+        # Close the current form
+        elif token == ")":
+            if not stack: raise SyntaxError(f"unmatched closing parenthesis at line {line}, column {match.start() - offset + 1} in {s.strip()}")
+            if quoted: raise SyntaxError(f"nothing to quote at line {line}, column {match.start() - offset + 1} in {s.strip()}")
+            item = current
+            current, quoted = stack.pop()
 
-def Alvin_to_list(s: str) -> list: 
-    """Divide Alvin expression into intermediary list of strings."""
-    return s.replace("(", " ( ").replace(")", " ) ").replace("'", " ' ").split()
+        # Quoted atoms are interned as written, everything else is retyped
+        else: item = dt.Symbol(token) if quoted else retype(token)
 
+        # Expand ' abbreviation to full (quote x) expressions
+        while quoted: item, quoted = [dt.Symbol("quote"), item], quoted - 1
 
-def lst_to_Python(expr: list) -> list:
-    """Convert intermediary list of strings into nested lists."""
+        current.append(item)
 
-    if expr == []: return []
+    # Report the outermost form left open
+    if stack: 
+        form = stack[1][0] if len(stack) > 1 else current
+        raise SyntaxError(f"unmatched opening parenthesis at line {form.line}, column {form.column} in {s.strip()}")
+    if quoted: raise SyntaxError(f"nothing to quote at end of {s.strip()}")
 
-    # If the head is an opening parenthesis,
-    elif expr[0] == "(": 
+    return current
 
-        # Find the corresponding closing parenthesis
-        closing_idx = get_opp_par(expr)
 
-        # Replace the section from opening to closing with a list, process the contents, process the rest, and return
-        return [lst_to_Python(expr[1:closing_idx]), *lst_to_Python(expr[closing_idx+1:])]
-    
-    # Otherwise leave as is and process the rest
-    return [expr[0], *lst_to_Python(expr[1:])]
 
+##### Incremental line reader #####
 
-def preprocess(expr: list) -> list:
-    """Replace all special data types."""
 
-    # Filter only expressions
-    if isinstance(expr, list):
-        if expr == []: return []
-        
-        # Process the head and the tail
-        elif isinstance(expr[0], list): return [preprocess(expr[0]), *preprocess(expr[1:])]
-        
-        # Expand ' abbreviation to full (quote x) expressions
-        elif expr[0] == "'": return [["quote", preprocess(expr[1])], *preprocess(expr[2:])]
 
-        # Otherwise replace with correct data type
-        return [retype(expr[0]), *preprocess(expr[1:])]
+class Reader:
+    """Incremental reader which splits lines of source text into complete expressions.
+    \nParenthesis depth, comment nesting and extension blocks are tracked across lines, so every
+    line is scanned exactly once no matter how long the expression it belongs to grows."""
+
+    def __init__(self) -> None:
+        """Initialize an empty reader."""
+
+        # Text of the incomplete expression, kept as a list of chunks
+        self.buffer = []
+
+        # Unclosed parentheses in the buffer
+        self.depth = 0
+
+        # Nesting of multiline comments
+        self.comments = 0
+
+        # Whether the reader is inside an @start ... @end extension block
+        self.extension = False
+
+        # How the current expression ends: "form" expressions start with ( or ' and end with their last
+        # parenthesis; "line" expressions (commands, atoms) end with the first line where parentheses balance
+        self.mode = None
+
+
+    def isempty(self) -> bool:
+        """Whether no incomplete expression is waiting for more lines."""
+        return not (self.buffer or self.extension)
+
+
+    def flush(self, text: str = "") -> str:
+        """Return the buffered expression followed by `text`, and reset the buffer."""
+
+        self.buffer.append(text)
+        expression = "".join(self.buffer)
+
+        self.buffer.clear()
+        self.mode = None
+
+        return expression
+
+
+    def feed(self, line: str) -> list:
+        """Read one line and return every expression it completes, in order."""
+
+        # Handle commented lines
+        if self.comments or any(comment in line for comment in (cf.config.SINGLE_COMMENT, cf.config.MULTILINE_COMMENT_OPEN, cf.config.MULTILINE_COMMENT_CLOSE)):
+            if cf.config.MULTILINE_COMMENT_CLOSE in line:
+                if self.comments: self.comments -= 1
+                else: raise SyntaxError(f"unmatched closing comment in {line}")
+            elif cf.config.MULTILINE_COMMENT_OPEN in line: self.comments += 1
+            return []
+
+        line = line if line.endswith("\n") else f"{line}\n"
+
+        # Extension blocks are copied verbatim up to @end
+        if self.extension or (self.mode is None and line.lstrip().startswith("@start")):
+            self.extension = "@end" not in line
+            if self.extension: self.buffer.append(line); return []
+            return [self.flush(line)]
+
+        expressions, start = [], 0
 
-    # Otherwise return original input atom
-    return expr
+        for match in TOKENS.finditer(line):
+            token = match.group()
+
+            if token == "\n": continue
+
+            # The first token decides how a new expression ends
+            elif self.mode is None: 
+                self.mode, start = "form" if token in "('" else "line", match.start()
+
+            if   token == "(": self.depth += 1
+            elif token == ")": self.depth -= 1
+
+            # Filter expressions that will never complete
+            if self.depth < 0: 
+                self.depth = 0
+                raise SyntaxError(f"fatal expression: {self.flush(line[start:]).strip()}")
+
+            # A form is complete as soon as its outermost datum closes
+            if self.mode == "form" and not self.depth and token != "'":
+                expressions.append(self.flush(line[start:match.end()]))
+
+        # Everything else waits for the end of a balanced line
+        if self.mode == "line" and not self.depth: expressions.append(self.flush(line[start:]))
+        elif self.mode: self.buffer.append(line[start:])
+
+        return expressions
 
 
 
@@ -133,18 +200,99 @@ def preprocess(expr: list) -> list:
 
 
 
-def convert(s: any) -> str | None:
+# Number of pieces of text collected before they are written out
+CHUNK = 1024
+
+# Marks the end of a list while writing
+END = object()
+
+
+def write(s: any, stream: any, depth: int = None, length: int = None) -> None:
+    """Write `s` to a text `stream` as a fully-parenthesized Alvin string, in chunks and without recursion.
+    \nLists nested more than `depth` levels are written as #, and lists longer than `length` are cut short with ...
+    \nWith neither limit the output is identical to `convert`."""
+
+    if s is None: return
+
+    # Pieces of text waiting to be written
+    pieces = []
+
+    # Iterators over the lists being written, with the number of elements written from each
+    stack = []
+
+    while True:
+
+        # Write one element, descending into lists
+        while True:
+
+            # Handle booleans
+            if isinstance(s, bool): pieces.append("#t" if s else "#f")
+
+            elif isinstance(s, dt.LISTS):
+
+                # Replace (quote x) with '
+                if kw.isquote(s): pieces.append("'"); s = s[1]; continue
+
+                elif depth is not None and len(stack) >= depth: pieces.append("#")
+
+                else: pieces.append("("); stack.append([iter(s), 0])
+
+            else: pieces.append(str(s))
+
+            break
+
+        # Flush full chunks
+        if len(pieces) >= CHUNK: stream.write("".join(pieces)); pieces.clear()
+
+        # Move on to the next element of the innermost unfinished list
+        while stack:
+            elements, written = frame = stack[-1]
+            descend = False
+
+            for s in elements:
+
+                # Skip missing values
+                if s is None: continue
+
+                # Cut long lists short
+                elif length is not None and written >= length: pieces.append(" ..." if written else "..."); break
+
+                if written: pieces.append(" ")
+                written += 1
+
+                # Lists need the full treatment
+                if isinstance(s, dt.LISTS): descend = True; break
+
+                # Atoms are written in place
+                pieces.append(("#t" if s else "#f") if isinstance(s, bool) else str(s))
+                if len(pieces) >= CHUNK: stream.write("".join(pieces)); pieces.clear()
+
+            if descend: frame[1] = written; break
+
+            # Close finished lists
+            pieces.append(")"); stack.pop()
+
+        else: break
+
+    stream.write("".join(pieces))
+
+
+def convert(s: any, depth: int = None, length: int = None) -> str | None:
     """Convert Python list to fully-parenthesized Alvin string."""
 
-    if s == None: return None
+    if s is None: return None
 
     # Handle booleans
     elif isinstance(s, bool): return "#t" if s else "#f"
 
+    # Atoms need no buffering
+    elif not isinstance(s, dt.LISTS): return str(s)
+
     # Otherwise replace lists with parentheses and (quote x) with '
-    return f"'{convert(s[1])}" if kw.isquote(s) else f"({' '.join(convert(elem) for elem in s if elem != None)})" if isinstance(s, list) else str(s)
+    buffer = io.StringIO(); write(s, buffer, depth, length); return buffer.getvalue()
 
 
 def parse(s: str) -> list: 
-    """Perform syntax checking and convert Alvin expression string to manipulable Python lists."""
-    return preprocess(lst_to_Python(syntax_check(Alvin_to_list(s)))).pop()
+    """Perform syntax checking and convert Alvin expression string to manipulable Python lists.
+    \nOnly the last expression in `s` is returned; use `read` to get all of them."""
+    return read(s).pop()
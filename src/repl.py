@@ -4,6 +4,7 @@
 
 import sys
 
+import cache as cc
 import config as cf
 import parser as prs
 import evaluate as ev
@@ -16,8 +17,8 @@ import interpreter as intrp
 
 
 
-def REPL(stream: str = sys.stdin, loadingFile: bool = False) -> None:
-    """Process a stream or load a file."""
+def REPL(stream: str = sys.stdin, loadingFile: bool = False, compiled: bool = False) -> None:
+    """Process a stream or load a file. A `compiled` stream holds expressions already split and parsed by the cache."""
     
     # Selectively display prompts/interactions
     showContent = cf.config.iFlag and not loadingFile
@@ -27,77 +28,89 @@ def REPL(stream: str = sys.stdin, loadingFile: bool = False) -> None:
             intrp.interpreter.welcome()
             intrp.interpreter.prompt()
     else: print(f"--- Alvin v{cf.config.VERSION} ---")
-        
-    # Initialize expression
-    expression = ""
 
-    for line in stream:
+    for expression in (stream if compiled else read(stream, loadingFile, showContent)):
 
-        # Handle commented lines
-        if prs.iscomment(line):
-            if cf.config.MULTILINE_COMMENT_CLOSE in line:
-                if cf.config.COMMENT_COUNTER: cf.config.COMMENT_COUNTER -= 1
-                else: raise SyntaxError(f"unmatched closing comment in {line}")
-            elif cf.config.MULTILINE_COMMENT_OPEN in line: cf.config.COMMENT_COUNTER += 1
-            continue        
-        
-        # Otherwise continue building expression
-        expression += f"{line}\n" if loadingFile else line
+        try: run(expression, loadingFile)
 
-        # If the expression is probably complete
-        if prs.iscomplete(expression):
-            
-            try: run(expression, loadingFile)
+        except Exception as e:
 
-            except Exception as e:
-
-                if cf.config.dFlag:
-                    
-                    # Safely exit extensions and raise full error
-                    intrp.interpreter.exit_extensions(); raise e
+            if cf.config.dFlag:
                 
-                else:
-
-                    # Just print exception without breaking the REPL
-                    print(f"{type(e).__name__}: {e}")
-                    
-                    # Random keyword deletion mode, because why not?
-                    if cf.config.zFlag: intrp.interpreter.del_random_keyword()
+                # Safely exit extensions and raise full error
+                intrp.interpreter.exit_extensions(); raise e
             
-            #  Print the prompt again and reset the expression
-            if showContent: intrp.interpreter.prompt()
-
-            expression = ""
-
-        # Otherwise print the 'interim' prompt for multiline expressions
-        elif showContent: intrp.interpreter.prompt(">   ")
+            else:
 
+                # Just print exception without breaking the REPL
+                print(f"{type(e).__name__}: {e}")
+                
+                # Random keyword deletion mode, because why not?
+                if cf.config.zFlag: intrp.interpreter.del_random_keyword()
+        
     # If we get ot the end of the stream without seeing the quit() command (e.g. when loading a file)
     else:
         if not cf.config.iFlag: intrp.interpreter.exit_extensions()
 
 
+def read(stream: str, loadingFile: bool = False, showContent: bool = False) -> iter:
+    """Split a stream of lines into complete expressions as soon as each one closes, skipping comments."""
+
+    reader = prs.Reader()
+
+    for line in stream:
+
+        yield from reader.feed(line)
+
+        # Print the prompt again, or the 'interim' prompt for multiline expressions
+        if showContent: intrp.interpreter.prompt() if reader.isempty() else intrp.interpreter.prompt(">   ")
+
+
+def run_file(location: str) -> None:
+    """Run a file, reusing its cached parse when one is available."""
+
+    # Fall back to reading the source directly
+    units = cc.load(location)
+    
+    if units is None:
+        with open(location, "r") as file: REPL(file.read().splitlines(), True)
+    
+    else: REPL(units, True, compiled=True)
+
+
 
 ##### Helper Functions #####
 
 
 
-def run(line: str, loadingFile: bool = False) -> None:
+def run(line: str | list, loadingFile: bool = False) -> None:
     """Execute a complete expression and print output, if any."""
 
-    output = interpret(line.strip())
+    output = interpret(line.strip() if isinstance(line, str) else line)
 
     # If the output is None, then the line probably has its own internal output solution
-    if output is not None and cf.config.iFlag != loadingFile: print(output)
+    if output is not None and cf.config.iFlag != loadingFile: display(output)
+
+
+def display(value: any) -> None:
+    """Stream a value to standard output followed by a newline, truncated when running interactively."""
+    
+    if cf.config.iFlag: prs.write(value, sys.stdout, cf.config.PRINT_DEPTH, cf.config.PRINT_LENGTH)
+    else: prs.write(value, sys.stdout)
+
+    print()
 
 
-def interpret(line: str) -> any:
+def interpret(line: str | list) -> any:
     """Fully interpret a complete expression."""
     
+    # Evaluate forms parsed ahead of time by the cache
+    if isinstance(line, list): return ev.run(line)
+
     # Handle interactive tools
     
     # Ignore empty lines
-    if line == "": return None
+    elif line == "": return None
     
     # Interpret using the Python interpreter
     elif line.startswith("python"): print(eval(line.removeprefix("python")))
@@ -111,5 +124,5 @@ def interpret(line: str) -> any:
     # Match interpreter commands
     elif line in intrp.interpreter.INTERPRETER: intrp.interpreter.INTERPRETER[line]()
 
-    # Otherwise parse the line and convert it to Python syntax, evaluate, and return as an Alvin string 
-    else: return prs.convert(ev.evaluate(prs.parse(line)))
+    # Otherwise parse the line and convert it to Python syntax, evaluate, and return the value
+    else: return ev.run(prs.parse(line))
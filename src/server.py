@@ -0,0 +1,154 @@
+"""Persistent interpreter which answers requests over a Unix socket from a pool of forked workers.
+\nLibraries are loaded once, before the workers are forked, so each worker starts with them already defined
+and shares their memory with the others. Each request runs in a process forked from its worker, so nothing
+it defines, changes or deletes is seen by later requests. Requests come from `client.py`:
+
+    python3 main.py serve [--socket=PATH] [--workers=N] library.alv ...
+"""
+
+
+
+import gc
+import io
+import os
+import sys
+import signal
+import socket
+import contextlib
+
+import repl as rpl
+import cache as cc
+import config as cf
+import client as cl
+
+
+
+##### Server #####
+
+
+
+def serve(args: list) -> None:
+    """Load the library files in `args`, then fork the workers and keep them running until interrupted."""
+
+    path = next((arg.removeprefix("--socket=") for arg in args if arg.startswith("--socket=")), cl.SOCKET)
+    workers = int(next((arg.removeprefix("--workers=") for arg in args if arg.startswith("--workers=")), cf.config.SERVER_WORKERS))
+
+    for library in args:
+        library.startswith("--") or rpl.run_file(library)
+
+    # Remove the socket of a server which did not shut down cleanly
+    if os.path.exists(path): os.remove(path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(128)
+
+    # Index the variables now, rather than again in every request
+    cf.config.ENV.bind()
+
+    # Keep the collector from touching, and so copying, everything loaded so far
+    gc.freeze()
+
+    # Stop cleanly when terminated as well as when interrupted
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+
+    children = set()
+
+    print(f"Serving on {path} with {workers} worker{"s"*(workers != 1)}", flush=True)
+
+    try:
+        while True:
+            while len(children) < workers: children.add(fork(listener))
+
+            # Replace workers as they exit
+            children.discard(os.wait()[0])
+
+    except (KeyboardInterrupt, SystemExit): pass
+
+    finally:
+        for child in children:
+            with contextlib.suppress(ProcessLookupError): os.kill(child, signal.SIGTERM)
+
+        listener.close()
+        os.path.exists(path) and os.remove(path)
+
+
+def fork(listener: socket.socket) -> int:
+    """Start a worker answering requests on `listener`, and return its process ID."""
+
+    pid = os.fork()
+    if pid: return pid
+
+    # Interrupts are left to the server, which terminates its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Programs read nothing from the terminal
+    sys.stdin = open(os.devnull)
+
+    try:
+        while True:
+            # Each request is answered by a copy of the worker, which it cannot change; the copy is forked
+            # before the request arrives, so that forking adds nothing to the time taken to answer it
+            child = os.fork()
+
+            if child == 0:
+                try:
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+                    connection, _ = listener.accept()
+                    with connection: answer(connection)
+
+                finally: os._exit(0)
+
+            # Terminating the worker terminates the copy waiting for a request
+            signal.signal(signal.SIGTERM, lambda *_: (os.kill(child, signal.SIGTERM), os._exit(0)))
+
+            os.waitpid(child, 0)
+
+    finally: os._exit(1)
+
+
+
+##### Requests #####
+
+
+
+def answer(connection: socket.socket) -> None:
+    """Run a request and stream its output back."""
+
+    chunks = []
+    while chunk := connection.recv(65536): chunks.append(chunk)
+
+    kind, _, body = b"".join(chunks).partition(b"\n")
+
+    output = connection.makefile("w", encoding="utf-8")
+
+    try:
+        with contextlib.redirect_stdout(output): run(kind, body.decode())
+        output.flush()
+
+    # The client has gone away
+    except OSError: pass
+
+
+def run(kind: bytes, body: str) -> None:
+    """Run a file or source as `main.py` would, but without touching extensions.py afterwards."""
+
+    print(f"--- Alvin v{cf.config.VERSION} ---")
+
+    if kind == cl.FILE:
+        units = cc.load(body)
+        expressions = rpl.read(io.StringIO(open(body).read()), True) if units is None else units
+
+    elif kind == cl.EVAL: expressions = rpl.read(io.StringIO(body), True)
+
+    else: print(f"ValueError: unknown request {kind.decode(errors="replace")}"); return
+
+    try:
+        for expression in expressions:
+            try: rpl.run(expression, True)
+            except Exception as e: print(f"{type(e).__name__}: {e}")
+
+    # Errors in splitting the source end the request, as they end a file
+    except SyntaxError as e: print(f"SyntaxError: {e}")
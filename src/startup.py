@@ -0,0 +1,91 @@
+"""Timing of interpreter startup, reported on exit when running with --startup-profile.
+\n`main.py` imports this module before any other, so that every module imported afterwards can be timed."""
+
+
+
+import sys
+import time
+import atexit
+import builtins
+import contextlib
+
+
+
+##### Timing #####
+
+
+
+ENABLED = "--startup-profile" in sys.argv
+
+# When profiling began
+START = time.perf_counter()
+
+# Phases as [name, depth, seconds] in the order they began, and the time each module spent importing itself
+PHASES, MODULES = [], {}
+
+# Time spent in nested imports by each import in progress, and the depth of the phases in progress
+NESTED, DEPTH = [], 0
+
+# The import function being timed
+IMPORT = builtins.__import__
+
+
+def timed_import(name: str, *args, **kwargs) -> any:
+    """Import a module, timing it if it has not been imported before."""
+
+    # Relative imports within packages are counted as part of the package
+    if not name or name in sys.modules: return IMPORT(name, *args, **kwargs)
+
+    start = time.perf_counter(); NESTED.append(0)
+
+    try: return IMPORT(name, *args, **kwargs)
+
+    finally:
+        elapsed, nested = time.perf_counter() - start, NESTED.pop()
+        MODULES[name] = MODULES.get(name, 0) + elapsed - nested
+        if NESTED: NESTED[-1] += elapsed
+
+
+@contextlib.contextmanager
+def phase(name: str) -> iter:
+    """Time the enclosed block as a phase of startup, inside any phase already in progress."""
+
+    global DEPTH
+
+    if not ENABLED: yield; return
+
+    entry, start = [name, DEPTH, 0], time.perf_counter()
+    PHASES.append(entry); DEPTH += 1
+
+    try: yield
+    finally: DEPTH -= 1; entry[2] = time.perf_counter() - start
+
+
+def imported() -> None:
+    """Record the time taken by imports so far as the first phase."""
+    ENABLED and PHASES.append(["imports", 0, time.perf_counter() - START])
+
+
+
+##### Report #####
+
+
+
+def report(modules: int = 8) -> None:
+    """Print each phase beneath the phase which contains it, and the modules which took longest to import."""
+
+    print("\nStartup profile (ms)", file=sys.stderr)
+
+    for name, depth, seconds in PHASES:
+        print(f"{"  " * (depth + 1)}{name:<{24 - 2 * depth}}{seconds * 1000:8.2f}", file=sys.stderr)
+
+        if name == "imports":
+            for module, seconds in sorted(MODULES.items(), key=lambda item: -item[1])[:modules]:
+                print(f"    {module:<22}{seconds * 1000:8.2f}", file=sys.stderr)
+
+    print(f"  {"total":<24}{(time.perf_counter() - START) * 1000:8.2f}", file=sys.stderr)
+
+
+if ENABLED:
+    builtins.__import__ = timed_import
+    atexit.register(report)
@@ -0,0 +1,117 @@
+"""Asynchronous calls into imported Python modules, on an event loop shared by the interpreters of a process.
+
+The loop runs in a background thread from the first asynchronous call onwards, so that calls keep running
+while the interpreter evaluates other expressions. Coroutine functions run on the loop itself and blocking
+functions in a pool of threads. Each interpreter has its own pool and limit on calls running at once, sized
+by its own settings. Only imported Python code ever runs off the main thread; the interpreter itself is
+never entered from the loop."""
+
+
+
+import os
+import weakref
+import functools
+
+import config as cf
+import parser as prs
+
+# asyncio takes longer to import than the rest of the interpreter together, so it is imported on first use
+asyncio = inspect = threading = concurrent = None
+
+
+
+##### Event Loop #####
+
+
+
+# The event loop and its thread, created on first use
+LOOP, THREAD = None, None
+
+# Pool of threads and limit on calls running at once of each interpreter, created on its first call
+LIMITS = weakref.WeakKeyDictionary()
+
+
+def loop() -> "asyncio.AbstractEventLoop":
+    """Return the event loop, starting it if necessary."""
+
+    global LOOP, THREAD, asyncio, inspect, threading, concurrent
+
+    if LOOP is None:
+        import asyncio, inspect, threading, concurrent.futures
+
+        LOOP = asyncio.new_event_loop()
+
+        THREAD = threading.Thread(target=LOOP.run_forever, name="alvin-loop", daemon=True)
+        THREAD.start()
+
+    return LOOP
+
+
+def limits() -> tuple:
+    """Return the pool of threads and the limit on calls running at once of the interpreter in use."""
+
+    context = cf.CONTEXT.get()
+
+    if context not in LIMITS:
+        LIMITS[context] = (concurrent.futures.ThreadPoolExecutor(context.ASYNC_THREADS, thread_name_prefix="alvin-call"), asyncio.Semaphore(context.ASYNC_LIMIT))
+
+    return LIMITS[context]
+
+
+def reset() -> None:
+    """Forget the event loop and the pools in a forked process, where their threads are not running."""
+    global LOOP, THREAD; LOOP = THREAD = None; LIMITS.clear()
+
+
+os.register_at_fork(after_in_child=reset)
+
+
+
+##### Tasks #####
+
+
+
+class Task:
+    """Handle on a call running on the event loop, whose value is collected with `await`."""
+
+    __slots__ = ("name", "future")
+
+    def __init__(self, name: str, future: "concurrent.futures.Future") -> None:
+        self.name, self.future = name, future
+
+
+    def result(self) -> any:
+        """Wait for the call to finish and return its value, or raise its exception."""
+        return self.future.result()
+
+
+    def __str__(self) -> str: return f"<task {self.name} {"done" if self.future.done() else "running"}>"
+
+
+
+async def run(function: callable, args: list, pool: "concurrent.futures.Executor", limit: "asyncio.Semaphore") -> any:
+    """Call `function`, natively if it is a coroutine function and otherwise in a thread of `pool`, within `limit`."""
+
+    async with limit:
+        if inspect.iscoroutinefunction(function): return await function(*args)
+
+        value = await asyncio.get_running_loop().run_in_executor(pool, functools.partial(function, *args))
+
+        # Some functions only return an awaitable
+        return await value if inspect.isawaitable(value) else value
+
+
+def call(name: str, function: callable, args: list) -> Task:
+    """Start calling `function` with `args` on the event loop."""
+
+    if not callable(function): raise TypeError(f"{name} is not callable")
+
+    # Starting the loop imports asyncio
+    target = loop()
+
+    return Task(name, asyncio.run_coroutine_threadsafe(run(function, args, *limits()), target))
+
+
+def sleep(seconds: int | float) -> Task:
+    """Start waiting for `seconds` on the event loop."""
+    target = loop(); return Task(f"sleep {prs.convert(seconds)}", asyncio.run_coroutine_threadsafe(asyncio.sleep(seconds), target))
@@ -1,5 +1,6 @@
 import os
 import sys
+import subprocess
 
 
 
@@ -14,14 +15,33 @@ def test(filepath: str, args: list = []) -> None:
     # Otherwise recurse into directory
     elif os.path.isdir(filepath):
         for file in sorted(os.listdir(filepath)): 
-            if file not in ["htmlcov"]: test(f"{filepath}/{file}", args)
+            if file not in ["htmlcov", "server"]: test(f"{filepath}/{file}", args)
+
+
+def serve(directory: str) -> None:
+    """Send each request in `directory` twice to a server with one worker, which has loaded `library.alv`
+    from the same directory, so that anything a request leaves behind shows in the second reply."""
+
+    socket = f"{directory}/test.sock"
+
+    server = subprocess.Popen(["coverage", "run", "--parallel-mode", "../src/main.py", "serve", f"--socket={socket}", "--workers=1", f"{directory}/library.alv"], stdout=subprocess.PIPE, text=True)
+
+    # The server announces itself once it is listening
+    while not server.stdout.readline().startswith("Serving"): pass
+
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".alv") and file != "library.alv":
+            os.system(f"echo '\nREQUEST: {directory}/{file}'")
+            os.system(f"{sys.executable} ../src/client.py --socket={socket} {directory}/{file} {directory}/{file} && echo")
+
+    server.terminate(); server.wait()
 
 
 def main() -> None:
     """Run all tests with command line args."""
 
     # Automatically run with command line flags, removing them from sys.argv as found; else by default run with all flags if none provided
-    flags = [ flag for flag in ["-i", "-d", "-p", "-z"] if (flag in sys.argv and not(sys.argv.remove(flag))) ] or ["-i", "-d", "-p", "-z"]
+    flags = [ flag for flag in ["-i", "-d", "-p", "-z", "-n", "-c", "-O"] if (flag in sys.argv and not(sys.argv.remove(flag))) ] or ["-i", "-d", "-p", "-z", "-n", "-c", "-O"]
     
     # Set initial directory to test folder
     initialDirectory = sys.argv[1] if len(sys.argv) > 1 else "../tests"
@@ -34,6 +54,15 @@ def main() -> None:
         os.system(f"echo '\nRunning with {flag} flag\n'")
         test(initialDirectory, args = [flag])
 
+    # Interactive printing limits only apply with their options
+    os.system("echo '\nRunning with printing limits\n'")
+    test(f"{initialDirectory}/repl/printing.alv", args = ["-i", "--print-depth=2", "--print-length=3"])
+
+    # Then requests to the server, which runs each on its own
+    if os.path.isdir(f"{initialDirectory}/server"):
+        os.system("echo '\nRunning requests to the server\n'")
+        serve(f"{initialDirectory}/server")
+
     # Finally print results
     os.system("coverage combine && coverage report && coverage html")
     